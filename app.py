@@ -1,20 +1,33 @@
 import os
 import logging
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, abort, Response, stream_with_context
+from flask.globals import app_ctx
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, scoped_session
 from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+from logging_config import configure_logging
 from sms_service import SMSService
-from utils import validate_phone_numbers, parse_csv_content, clean_phone_number
+from suppression import suppression_list
+from scheduler import campaign_scheduler, next_send_time, plan_chunks
+from pricing import cost_estimator, count_by_network
+from templating import CSVRecipients, MessageTemplate
+from archive import iter_archived_rows, load_archived_campaign, RECORD_FIELDS
+from response_cache import response_cache, cached_view
+from utils import validate_phone_numbers, validate_single_phone_number, parse_csv_content, clean_phone_number, normalize_phone_numbers, NETWORK_PREFIX_TABLE
+import csv
 import json
-from datetime import datetime, date
+import threading
+from datetime import datetime, date, timedelta, time as dt_time, timezone
 from enum import Enum
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (LOG_LEVEL, LOG_ASYNC; see logging_config.py)
+configure_logging()
 
 # Create the app
 app = Flask(__name__)
@@ -24,25 +37,129 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 # Configure the database
 database_url = os.environ.get("DATABASE_URL", "sqlite:///sms_app.db")
 
+# Reporting routes read through a separate engine with its own pool, so
+# dashboards never wait on (or hold up) the connections used for sending.
+# It points at a replica if READ_DATABASE_URL is set, else at the same database.
+READ_BIND = "reporting"
+read_database_url = os.environ.get("READ_DATABASE_URL", database_url)
+
+
+def is_memory_database(url):
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url, pool_size_var, max_overflow_var, default_pool_size, default_max_overflow):
+    """Engine options with pool sizing from the environment"""
+    options = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    # In-memory SQLite uses a single static connection and takes no pool sizing
+    if not is_memory_database(url):
+        options["pool_size"] = int(os.environ.get(pool_size_var, default_pool_size))
+        options["max_overflow"] = int(os.environ.get(max_overflow_var, default_max_overflow))
+    return options
+
+
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url, "DB_POOL_SIZE", "DB_MAX_OVERFLOW", 5, 10)
+# A second engine on the same in-memory database would see an empty one
+if not (read_database_url == database_url and is_memory_database(database_url)):
+    app.config["SQLALCHEMY_BINDS"] = {
+        READ_BIND: {
+            "url": read_database_url,
+            **engine_options(read_database_url, "READ_DB_POOL_SIZE", "READ_DB_MAX_OVERFLOW", 2, 3),
+            # Dashboards give up rather than queue for long behind each other
+            "pool_timeout": int(os.environ.get("READ_DB_POOL_TIMEOUT", "10")),
+        }
+    }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# A replica may lag behind the commit that clears the response cache and
+# the page would be cached stale, so with one every request re-renders;
+# unchanged pages are still answered with 304 through their ETag
+if read_database_url != database_url:
+    response_cache.max_entries = 0
+
 # Create the db instance
 db = SQLAlchemy()
 db.init_app(app)
 
-# Initialize SMS service
-sms_service = SMSService()
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the writer instead of blocking on it
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def _make_sqlite_read_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def get_read_engine():
+    """Return the engine reporting routes read through"""
+    return db.engines.get(READ_BIND, db.engine)
+
+
+with app.app_context():
+    if db.engine.dialect.name == "sqlite":
+        event.listen(db.engine, "connect", _enable_sqlite_wal)
+    if READ_BIND in db.engines and db.engines[READ_BIND].dialect.name == "sqlite":
+        event.listen(db.engines[READ_BIND], "connect", _make_sqlite_read_only)
+
+# Session for reporting reads, bound to the read engine and scoped to the
+# app context like db.session
+read_session = scoped_session(
+    lambda: Session(bind=get_read_engine(), autoflush=False),
+    scopefunc=lambda: id(app_ctx._get_current_object())
+)
+
+
+@app.teardown_appcontext
+def remove_read_session(exception=None):
+    read_session.remove()
+
+# SMS service, created lazily in each worker process (see get_sms_service)
+_sms_service = None
+_sms_service_pid = None
+_sms_service_lock = threading.Lock()
+
+
+def get_sms_service():
+    """Return this process's SMSService, creating it on first use.
+
+    The service (and the Africa's Talking SDK) is set up after a worker
+    forks, never in a preloading master, so no client or connection is
+    shared between processes.
+    """
+    global _sms_service, _sms_service_pid
+    if _sms_service is None or _sms_service_pid != os.getpid():
+        with _sms_service_lock:
+            if _sms_service is None or _sms_service_pid != os.getpid():
+                _sms_service = SMSService()
+                _sms_service_pid = os.getpid()
+    return _sms_service
 
 
 class SMSStatus(str, Enum):
     PENDING = "pending"
     SUCCESS = "success"
     FAILED = "failed"
+    SUPPRESSED = "suppressed"
+    SCHEDULED = "scheduled"
+    CANCELLED = "cancelled"
+
+
+class ScheduleStatus(str, Enum):
+    SCHEDULED = "scheduled"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
 
 
 class SMSCampaign(db.Model):
@@ -73,7 +190,7 @@ class SMSRecord(db.Model):
     __tablename__ = "sms_records"
     
     id = db.Column(db.Integer, primary_key=True)
-    campaign_id = db.Column(db.Integer, db.ForeignKey("sms_campaigns.id"), nullable=False)
+    campaign_id = db.Column(db.Integer, db.ForeignKey("sms_campaigns.id"), nullable=False, index=True)
     phone_number = db.Column(db.String(20), nullable=False)
     status = db.Column(db.String(20), nullable=False, default=SMSStatus.PENDING.value)
     message_id = db.Column(db.String(100), nullable=True)  # From SMS provider
@@ -91,7 +208,7 @@ class InvalidPhoneNumber(db.Model):
     __tablename__ = "invalid_phone_numbers"
     
     id = db.Column(db.Integer, primary_key=True)
-    campaign_id = db.Column(db.Integer, db.ForeignKey("sms_campaigns.id"), nullable=False)
+    campaign_id = db.Column(db.Integer, db.ForeignKey("sms_campaigns.id"), nullable=False, index=True)
     phone_number = db.Column(db.String(50), nullable=False)
     reason = db.Column(db.String(200), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -118,23 +235,356 @@ class SMSStatistics(db.Model):
         return f'<SMSStatistics {self.date}: {self.total_messages_sent} messages>'
 
 
-# Create database tables
-with app.app_context():
-    db.create_all()
+class ContactList(db.Model):
+    """Model for storing reusable recipient lists"""
+    __tablename__ = "contact_lists"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Relationship to contacts
+    contacts = db.relationship("Contact", backref="contact_list", lazy="dynamic", cascade="all, delete-orphan")
+    
+    def __repr__(self):
+        return f'<ContactList {self.id}: {self.name}>'
+
+
+class Contact(db.Model):
+    """Model for storing normalized, validated numbers of a contact list"""
+    __tablename__ = "contacts"
+    # The unique constraint doubles as the (list, number) lookup index
+    __table_args__ = (
+        db.UniqueConstraint("contact_list_id", "phone_number", name="uq_contacts_list_phone"),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    contact_list_id = db.Column(db.Integer, db.ForeignKey("contact_lists.id"), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Contact {self.id}: {self.phone_number}>'
+
+
+class SuppressedNumber(db.Model):
+    """Model for storing opted-out numbers that must never be sent to"""
+    __tablename__ = "suppressed_numbers"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    phone_number = db.Column(db.String(20), nullable=False, unique=True)
+    reason = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SuppressedNumber {self.id}: {self.phone_number}>'
+
+
+class SuppressionRemoval(db.Model):
+    """Model logging numbers removed from the suppression list, so workers can drop them incrementally"""
+    __tablename__ = "suppression_removals"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    phone_number = db.Column(db.String(20), nullable=False)
+    removed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SuppressionRemoval {self.id}: {self.phone_number}>'
+
+
+class ScheduledCampaign(db.Model):
+    """Model for storing campaigns queued to send later, optionally within a daily window"""
+    __tablename__ = "scheduled_campaigns"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey("sms_campaigns.id"), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    phone_numbers = db.Column(db.Text, nullable=True)  # Validated numbers, one per line
+    contact_list_id = db.Column(db.Integer, db.ForeignKey("contact_lists.id"), nullable=True)
+    start_at = db.Column(db.DateTime, nullable=False)  # UTC, already moved into the send window
+    window_start = db.Column(db.Time, nullable=True)
+    window_end = db.Column(db.Time, nullable=True)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    total_chunks = db.Column(db.Integer, nullable=False)
+    chunk_interval = db.Column(db.Float, nullable=False, default=0.0)  # Seconds between chunk starts
+    chunks_done = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default=ScheduleStatus.SCHEDULED.value, index=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)  # When the running chunk was last claimed
+    error_message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    campaign = db.relationship("SMSCampaign")
+    
+    def next_chunk_at(self):
+        """When the next chunk may run: its planned slot, moved into the send window if needed"""
+        planned = self.start_at + timedelta(seconds=self.chunk_interval * self.chunks_done)
+        return next_send_time(max(planned, datetime.utcnow()), self.window_start, self.window_end)
+    
+    def __repr__(self):
+        return f'<ScheduledCampaign {self.id}: campaign {self.campaign_id} at {self.start_at}>'
+
+
+class TransactionalCampaign(db.Model):
+    """Model marking the campaign that collects one UTC day's transactional messages"""
+    __tablename__ = "transactional_campaigns"
+    
+    date = db.Column(db.Date, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey("sms_campaigns.id"), nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f'<TransactionalCampaign {self.date}: campaign {self.campaign_id}>'
+
+
+class ArchivedCampaign(db.Model):
+    """Model marking campaigns whose records were moved to a cold-storage archive file"""
+    __tablename__ = "archived_campaigns"
+    
+    campaign_id = db.Column(db.Integer, db.ForeignKey("sms_campaigns.id"), primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    invalid_count = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchivedCampaign {self.campaign_id}: {self.record_count} records>'
+
+
+# Cached campaign and statistics pages are dropped whenever a transaction
+# that changed campaigns or statistics commits in this process. Other
+# processes catch up within RESPONSE_CACHE_TTL.
+CACHED_MODELS = (SMSCampaign, SMSStatistics)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_cached_model_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CACHED_MODELS):
+            session.info['invalidate_response_cache'] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_cached_model_bulk_changes(orm_execute_state):
+    # Bulk query.update()/delete() calls bypass the flush
+    if (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert) \
+            and orm_execute_state.bind_mapper is not None \
+            and orm_execute_state.bind_mapper.class_ in CACHED_MODELS:
+        orm_execute_state.session.info['invalidate_response_cache'] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_response_cache(session):
+    if session.info.pop('invalidate_response_cache', False):
+        response_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cached_model_changes(session):
+    session.info.pop('invalidate_response_cache', None)
+
+
+# Create database tables on import for development. Production workers set
+# AUTO_CREATE_TABLES=False and run schema setup once (init_db.py)
+if os.environ.get("AUTO_CREATE_TABLES", "True").lower() == "true":
+    with app.app_context():
+        db.create_all()
+
+# Background services are started per process, from gunicorn's post_fork
+# hook or else on first request, so nothing runs in a preloading master
+# before workers fork
+_background_services_pid = None
+
+
+def start_background_services():
+    """Start loading the suppression list and the campaign scheduler (unless disabled) in this process"""
+    global _background_services_pid
+    if _background_services_pid == os.getpid():
+        return
+    _background_services_pid = os.getpid()
+    suppression_list.start()
+    if os.environ.get("SCHEDULER_ENABLED", "True").lower() == "true":
+        campaign_scheduler.start()
+
+
+@app.before_request
+def ensure_background_services():
+    start_background_services()
+
+def collect_phone_numbers():
+    """Collect raw phone numbers from the textarea and CSV upload of the current request.
+
+    Raises ValueError if the uploaded CSV file cannot be read.
+    """
+    phone_numbers = []
+    phone_numbers_text = request.form.get('phone_numbers', '').strip()
+    csv_file = request.files.get('csv_file')
+    
+    # From textarea
+    if phone_numbers_text:
+        textarea_numbers = [line.strip() for line in phone_numbers_text.split('\n') if line.strip()]
+        phone_numbers.extend(textarea_numbers)
+    
+    # From CSV file
+    if csv_file and csv_file.filename:
+        try:
+            csv_content = csv_file.read().decode('utf-8')
+            phone_numbers.extend(parse_csv_content(csv_content))
+        except Exception as e:
+            logging.error(f"CSV parsing error: {str(e)}")
+            raise ValueError(f'Error reading CSV file: {str(e)}')
+    
+    return phone_numbers
+
+def import_contacts(contact_list, phone_numbers):
+    """Normalize phone numbers and add the new ones to a contact list"""
+    valid_numbers, invalid_numbers, duplicates = normalize_phone_numbers(phone_numbers)
+    
+    # Skip numbers that are already on the list; the unique constraint
+    # guards against races, this keeps the common case a plain bulk insert
+    existing = set()
+    for i in range(0, len(valid_numbers), 500):
+        chunk = valid_numbers[i:i + 500]
+        rows = db.session.query(Contact.phone_number).filter(
+            Contact.contact_list_id == contact_list.id,
+            Contact.phone_number.in_(chunk)
+        ).all()
+        existing.update(row[0] for row in rows)
+    
+    now = datetime.utcnow()
+    new_contacts = [
+        {'contact_list_id': contact_list.id, 'phone_number': number, 'created_at': now}
+        for number in valid_numbers if number not in existing
+    ]
+    if new_contacts:
+        db.session.execute(Contact.__table__.insert(), new_contacts)
+    
+    return {
+        'imported': len(new_contacts),
+        'duplicates': duplicates + len(existing),
+        'invalid_numbers': len(invalid_numbers),
+        'invalid_numbers_list': invalid_numbers[:10]
+    }
+
+def count_contact_list_networks(contact_list_id):
+    """Count the contacts of a list per mobile network.
+
+    Stored numbers are all +233XXXXXXXXX, so the network prefix is grouped
+    in the database instead of loading every number.
+    """
+    prefix = db.func.substr(Contact.phone_number, 5, 2)
+    rows = db.session.query(prefix, db.func.count(Contact.id)).filter(
+        Contact.contact_list_id == contact_list_id
+    ).group_by(prefix).all()
+    
+    counts = {}
+    for network_prefix, count in rows:
+        network = NETWORK_PREFIX_TABLE[int(network_prefix)]
+        counts[network] = counts.get(network, 0) + count
+    return counts
+
+def complete_campaign(campaign, results, messages_sent, final=True):
+    """Add send results to a campaign and roll them into the daily statistics.
+
+    Campaigns sent in several chunks call this once per chunk; only the
+    final call marks the campaign complete and counts it as a campaign.
+    """
+    # Suppressed recipients were recorded but never sent
+    messages_sent -= results.get('suppressed', 0)
+    
+    # Update campaign with results; atomic in-database increments keep
+    # chunks finishing in different processes from overwriting each other
+    counters = {
+        SMSCampaign.successful_sends: SMSCampaign.successful_sends + results['successful'],
+        SMSCampaign.failed_sends: SMSCampaign.failed_sends + results['failed'],
+        SMSCampaign.total_cost: SMSCampaign.total_cost + results.get('total_cost', 0.0)
+    }
+    if final:
+        counters[SMSCampaign.status] = case(
+            (SMSCampaign.failed_sends + results['failed'] == 0, SMSStatus.SUCCESS.value),
+            else_=SMSStatus.FAILED.value
+        )
+        counters[SMSCampaign.completed_at] = datetime.utcnow()
+    db.session.flush()
+    SMSCampaign.query.filter_by(id=campaign.id).update(counters, synchronize_session=False)
+    db.session.expire(campaign)
+    
+    # Update daily statistics
+    today = date.today()
+    stats = SMSStatistics.query.filter_by(date=today).first()
+    if not stats:
+        stats = SMSStatistics()
+        stats.date = today
+        stats.total_campaigns = 1 if final else 0
+        stats.total_messages_sent = messages_sent
+        stats.total_successful = results['successful']
+        stats.total_failed = results['failed']
+        stats.total_cost = results.get('total_cost', 0.0)
+        db.session.add(stats)
+    else:
+        stats.total_campaigns += 1 if final else 0
+        stats.total_messages_sent += messages_sent
+        stats.total_successful += results['successful']
+        stats.total_failed += results['failed']
+        stats.total_cost += results.get('total_cost', 0.0)
+        stats.updated_at = datetime.utcnow()
+
+# Campaign that collects the day's transactional messages: (date, campaign id)
+_transactional_campaign = None
+_transactional_campaign_lock = threading.Lock()
+
+TRANSACTIONAL_CAMPAIGN_MESSAGE = 'Transactional messages'
+
+def get_transactional_campaign_id():
+    """Return the id of today's (UTC) transactional campaign, creating it on first use.
+
+    The day's campaign is registered in `transactional_campaigns`, keyed by
+    date, so concurrent workers agree on a single campaign per day.
+    """
+    from sqlalchemy.exc import IntegrityError
+    
+    global _transactional_campaign
+    today = datetime.utcnow().date()
+    cached = _transactional_campaign
+    if cached and cached[0] == today:
+        return cached[1]
+    
+    with _transactional_campaign_lock:
+        marker = db.session.get(TransactionalCampaign, today)
+        if marker is None:
+            campaign = SMSCampaign()
+            campaign.message = TRANSACTIONAL_CAMPAIGN_MESSAGE
+            campaign.status = SMSStatus.SUCCESS
+            db.session.add(campaign)
+            db.session.flush()
+            marker = TransactionalCampaign()
+            marker.date = today
+            marker.campaign_id = campaign.id
+            db.session.add(marker)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another worker registered today's campaign first
+                db.session.rollback()
+                marker = db.session.get(TransactionalCampaign, today)
+        _transactional_campaign = (today, marker.campaign_id)
+        return marker.campaign_id
 
 @app.route('/')
 def index():
     """Main page with the SMS form"""
     return render_template('index.html')
 
+# Recipients /send_sms sends within the request; larger sends go through
+# /schedule_campaign, which sends in chunks in the background
+MAX_DIRECT_RECIPIENTS = 300
+
 @app.route('/send_sms', methods=['POST'])
 def send_sms():
     """Handle SMS sending request"""
     try:
         # Get form data
         message = request.form.get('message', '').strip()
-        phone_numbers_text = request.form.get('phone_numbers', '').strip()
-        csv_file = request.files.get('csv_file')
+        contact_list_id = request.form.get('contact_list_id', type=int)
         
         # Validate message
         if not message:
@@ -150,25 +600,21 @@ def send_sms():
             }), 400
         
         # Collect phone numbers
-        phone_numbers = []
-        
-        # From textarea
-        if phone_numbers_text:
-            textarea_numbers = [line.strip() for line in phone_numbers_text.split('\n') if line.strip()]
-            phone_numbers.extend(textarea_numbers)
+        try:
+            phone_numbers = collect_phone_numbers()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        # From CSV file
-        if csv_file and csv_file.filename:
-            try:
-                csv_content = csv_file.read().decode('utf-8')
-                csv_numbers = parse_csv_content(csv_content)
-                phone_numbers.extend(csv_numbers)
-            except Exception as e:
-                logging.error(f"CSV parsing error: {str(e)}")
+        if contact_list_id is not None:
+            if phone_numbers:
                 return jsonify({
                     'success': False,
-                    'error': f'Error reading CSV file: {str(e)}'
+                    'error': 'Provide either a contact list or phone numbers, not both'
                 }), 400
+            return send_to_contact_list(message, contact_list_id)
         
         # Validate phone numbers
         if not phone_numbers:
@@ -177,10 +623,10 @@ def send_sms():
                 'error': 'At least one phone number is required'
             }), 400
             
-        if len(phone_numbers) > 300:
+        if len(phone_numbers) > MAX_DIRECT_RECIPIENTS:
             return jsonify({
                 'success': False,
-                'error': 'Maximum 300 phone numbers allowed'
+                'error': f'Maximum {MAX_DIRECT_RECIPIENTS} phone numbers allowed'
             }), 400
         
         # Clean and validate phone numbers
@@ -200,6 +646,16 @@ def send_sms():
                 'error': 'No valid phone numbers found'
             }), 400
         
+        # Reject oversize campaigns before paying to send them
+        estimate = cost_estimator.estimate(message, count_by_network(valid_numbers))
+        limit_error = cost_estimator.check_limits(estimate)
+        if limit_error:
+            return jsonify({
+                'success': False,
+                'error': limit_error,
+                'estimate': estimate
+            }), 400
+        
         # Create SMS campaign record
         
         campaign = SMSCampaign()
@@ -218,34 +674,9 @@ def send_sms():
             db.session.add(invalid_record)
         
         # Send SMS messages
-        results = sms_service.send_bulk_sms_with_database(message, valid_numbers, campaign.id)
-        
-        # Update campaign with results
-        campaign.successful_sends = results['successful']
-        campaign.failed_sends = results['failed']
-        campaign.total_cost = results.get('total_cost', 0.0)
-        campaign.status = SMSStatus.SUCCESS if results['failed'] == 0 else SMSStatus.FAILED
-        campaign.completed_at = datetime.utcnow()
-        
-        # Update daily statistics
-        today = date.today()
-        stats = SMSStatistics.query.filter_by(date=today).first()
-        if not stats:
-            stats = SMSStatistics()
-            stats.date = today
-            stats.total_campaigns = 1
-            stats.total_messages_sent = len(valid_numbers)
-            stats.total_successful = results['successful']
-            stats.total_failed = results['failed']
-            stats.total_cost = results.get('total_cost', 0.0)
-            db.session.add(stats)
-        else:
-            stats.total_campaigns += 1
-            stats.total_messages_sent += len(valid_numbers)
-            stats.total_successful += results['successful']
-            stats.total_failed += results['failed']
-            stats.total_cost += results.get('total_cost', 0.0)
-            stats.updated_at = datetime.utcnow()
+        results = get_sms_service().send_bulk_sms_with_database(message, valid_numbers, campaign.id)
+        
+        complete_campaign(campaign, results, len(valid_numbers))
         
         db.session.commit()
         
@@ -258,6 +689,7 @@ def send_sms():
             'invalid_numbers': len(invalid_numbers),
             'successful_sends': results['successful'],
             'failed_sends': results['failed'],
+            'suppressed_sends': results.get('suppressed', 0),
             'invalid_numbers_list': invalid_numbers[:10],  # Show first 10 invalid numbers
             'message_length': len(message),
             'total_cost': results.get('total_cost', 0.0),
@@ -274,37 +706,775 @@ def send_sms():
             'error': f'An unexpected error occurred: {str(e)}'
         }), 500
 
+def send_to_contact_list(message, contact_list_id):
+    """Send a campaign to a stored contact list.
+
+    Contacts were normalized and validated at import, so recipient rows are
+    generated in the database instead of being re-parsed per request.
+    """
+    contact_list = db.session.get(ContactList, contact_list_id)
+    if contact_list is None:
+        return jsonify({
+            'success': False,
+            'error': f'Contact list {contact_list_id} not found'
+        }), 404
+    
+    total_contacts = contact_list.contacts.count()
+    if not total_contacts:
+        return jsonify({
+            'success': False,
+            'error': 'Contact list is empty'
+        }), 400
+    
+    if total_contacts > MAX_DIRECT_RECIPIENTS:
+        return jsonify({
+            'success': False,
+            'error': f'Contact list has {total_contacts} contacts; at most {MAX_DIRECT_RECIPIENTS} can be sent at once. '
+                     f'Use /schedule_campaign to send larger lists in chunks.'
+        }), 400
+    
+    estimate = cost_estimator.estimate(message, count_contact_list_networks(contact_list.id))
+    limit_error = cost_estimator.check_limits(estimate)
+    if limit_error:
+        return jsonify({
+            'success': False,
+            'error': limit_error,
+            'estimate': estimate
+        }), 400
+    
+    # Create SMS campaign record
+    campaign = SMSCampaign()
+    campaign.message = message
+    campaign.total_recipients = total_contacts
+    campaign.invalid_numbers = 0
+    db.session.add(campaign)
+    db.session.flush()  # Get the campaign ID
+    
+    # Send SMS messages
+    results = get_sms_service().send_bulk_sms_to_contact_list(message, contact_list.id, campaign.id)
+    
+    complete_campaign(campaign, results, total_contacts)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'campaign_id': campaign.id,
+        'contact_list_id': contact_list.id,
+        'total_numbers': total_contacts,
+        'valid_numbers': total_contacts,
+        'invalid_numbers': 0,
+        'successful_sends': results['successful'],
+        'failed_sends': results['failed'],
+        'suppressed_sends': results.get('suppressed', 0),
+        'invalid_numbers_list': [],
+        'message_length': len(message),
+        'total_cost': results.get('total_cost', 0.0),
+        'results': results
+    })
+
+@app.route('/send_personalized', methods=['POST'])
+def send_personalized():
+    """Send a templated campaign with {column} placeholders filled from an uploaded CSV file"""
+    try:
+        message = request.form.get('message', '').strip()
+        phone_column = request.form.get('phone_column', '').strip() or None
+        csv_file = request.files.get('csv_file')
+        
+        # Validate message
+        if not message:
+            return jsonify({
+                'success': False,
+                'error': 'Message is required'
+            }), 400
+            
+        if len(message) > 1600:  # SMS length limit
+            return jsonify({
+                'success': False,
+                'error': 'Message is too long. Maximum 1600 characters allowed.'
+            }), 400
+        
+        if not csv_file or not csv_file.filename:
+            return jsonify({
+                'success': False,
+                'error': 'A CSV file with a header row is required'
+            }), 400
+        
+        # Read the header and compile the template once for the whole campaign
+        try:
+            recipients = CSVRecipients(csv_file.stream, phone_column)
+            template = MessageTemplate(message, recipients.columns)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        campaign = None
+        invalid_numbers = []  # The first 10, for the response
+        invalid_count = 0
+        
+        def valid_recipients():
+            # Streams (phone number, rendered text) straight from the upload;
+            # invalid numbers are counted, and stored once the campaign exists
+            nonlocal invalid_count
+            invalid_count = 0
+            for raw_number, row in recipients:
+                phone_number = clean_phone_number(raw_number)
+                if validate_single_phone_number(phone_number):
+                    yield phone_number, template.render(row)
+                    continue
+                invalid_count += 1
+                if campaign is None:
+                    continue
+                if len(invalid_numbers) < 10:
+                    invalid_numbers.append(raw_number)
+                invalid_record = InvalidPhoneNumber()
+                invalid_record.campaign_id = campaign.id
+                invalid_record.phone_number = raw_number
+                invalid_record.reason = 'Invalid format'
+                db.session.add(invalid_record)
+        
+        # Reading a campaign is cheap next to sending it, so the whole file is
+        # read once before the first send: a malformed row is reported before
+        # anything goes out, the recipients are counted, and the limits are
+        # checked when any are configured
+        try:
+            estimate = None
+            if cost_estimator.max_segments or cost_estimator.max_cost is not None:
+                estimate = cost_estimator.estimate_personalized(valid_recipients())
+                valid_count = estimate['recipients']
+            else:
+                valid_count = sum(1 for _ in valid_recipients())
+        except (UnicodeDecodeError, csv.Error) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Error reading CSV file: {str(e)}'
+            }), 400
+        
+        if valid_count + invalid_count > MAX_DIRECT_RECIPIENTS:
+            return jsonify({
+                'success': False,
+                'error': f'The file has {valid_count + invalid_count} recipients; at most {MAX_DIRECT_RECIPIENTS} '
+                         f'can be sent at once. Split the file, or use /schedule_campaign to send larger campaigns in chunks.'
+            }), 400
+        
+        if not valid_count:
+            return jsonify({
+                'success': False,
+                'error': 'No valid phone numbers found'
+            }), 400
+        
+        if estimate is not None:
+            limit_error = cost_estimator.check_limits(estimate)
+            if limit_error:
+                return jsonify({
+                    'success': False,
+                    'error': limit_error,
+                    'estimate': estimate
+                }), 400
+        
+        # Create SMS campaign record; the template is stored as its message
+        campaign = SMSCampaign()
+        campaign.message = message
+        campaign.total_recipients = 0
+        db.session.add(campaign)
+        db.session.flush()  # Get the campaign ID
+        
+        results = get_sms_service().send_bulk_sms_personalized(valid_recipients(), campaign.id)
+        valid_count = results['successful'] + results['failed'] + results['suppressed']
+        
+        campaign.total_recipients = valid_count + invalid_count
+        campaign.invalid_numbers = invalid_count
+        complete_campaign(campaign, results, valid_count)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'campaign_id': campaign.id,
+            'total_numbers': valid_count + invalid_count,
+            'valid_numbers': valid_count,
+            'invalid_numbers': invalid_count,
+            'successful_sends': results['successful'],
+            'failed_sends': results['failed'],
+            'suppressed_sends': results['suppressed'],
+            'invalid_numbers_list': invalid_numbers[:10],
+            'placeholders': template.fields,
+            'total_cost': results['total_cost'],
+            'results': results
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in send_personalized: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/estimate_cost', methods=['POST'])
+def estimate_cost():
+    """Estimate the SMS parts and cost of a campaign without sending it"""
+    message = request.form.get('message', '')
+    contact_list_id = request.form.get('contact_list_id', type=int)
+    
+    try:
+        phone_numbers = collect_phone_numbers()
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    if contact_list_id is not None:
+        if db.session.get(ContactList, contact_list_id) is None:
+            return jsonify({
+                'success': False,
+                'error': f'Contact list {contact_list_id} not found'
+            }), 404
+        network_counts = count_contact_list_networks(contact_list_id)
+        invalid_count = 0
+    else:
+        # Counted the way /send_sms sends: duplicates included
+        cleaned_numbers = [clean_phone_number(number) for number in phone_numbers]
+        valid_numbers = [number for number in cleaned_numbers if validate_single_phone_number(number)]
+        network_counts = count_by_network(valid_numbers)
+        invalid_count = len(phone_numbers) - len(valid_numbers)
+    
+    estimate = cost_estimator.estimate(message.strip(), network_counts)
+    limit_error = cost_estimator.check_limits(estimate)
+    
+    return jsonify({
+        'success': True,
+        'invalid_numbers': invalid_count,
+        'within_limits': limit_error is None,
+        'limit_error': limit_error,
+        **estimate
+    })
+
+@app.route('/contact_lists', methods=['GET'])
+def contact_lists():
+    """List stored contact lists with their sizes"""
+    from sqlalchemy import func
+    
+    rows = db.session.query(ContactList, func.count(Contact.id)).outerjoin(
+        Contact, Contact.contact_list_id == ContactList.id
+    ).group_by(ContactList.id).order_by(ContactList.created_at.desc()).all()
+    
+    return jsonify({
+        'success': True,
+        'contact_lists': [{
+            'id': contact_list.id,
+            'name': contact_list.name,
+            'total_contacts': total_contacts,
+            'created_at': contact_list.created_at.isoformat()
+        } for contact_list, total_contacts in rows]
+    })
+
+@app.route('/contact_lists', methods=['POST'])
+def create_contact_list():
+    """Create a contact list from pasted numbers and/or a CSV upload"""
+    try:
+        name = request.form.get('name', '').strip()
+        if not name:
+            return jsonify({
+                'success': False,
+                'error': 'Contact list name is required'
+            }), 400
+        
+        if ContactList.query.filter_by(name=name).first():
+            return jsonify({
+                'success': False,
+                'error': f'A contact list named "{name}" already exists'
+            }), 400
+        
+        try:
+            phone_numbers = collect_phone_numbers()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        contact_list = ContactList()
+        contact_list.name = name
+        db.session.add(contact_list)
+        db.session.flush()  # Get the list ID
+        
+        summary = import_contacts(contact_list, phone_numbers)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'contact_list_id': contact_list.id, **summary}), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in create_contact_list: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/contact_lists/<int:contact_list_id>/contacts', methods=['POST'])
+def add_contacts(contact_list_id):
+    """Add numbers to an existing contact list, skipping ones already on it"""
+    contact_list = ContactList.query.get_or_404(contact_list_id)
+    try:
+        try:
+            phone_numbers = collect_phone_numbers()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        summary = import_contacts(contact_list, phone_numbers)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'contact_list_id': contact_list.id, **summary})
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in add_contacts: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/send_transactional', methods=['POST'])
+def send_transactional():
+    """Send a single transactional message (OTP, alert) through the priority lane"""
+    try:
+        data = request.get_json(silent=True) or request.form
+        message = (data.get('message') or '').strip()
+        phone_number = clean_phone_number(data.get('phone_number') or '')
+        
+        if not message:
+            return jsonify({
+                'success': False,
+                'error': 'Message is required'
+            }), 400
+        
+        if len(message) > 1600:  # SMS length limit
+            return jsonify({
+                'success': False,
+                'error': 'Message is too long. Maximum 1600 characters allowed.'
+            }), 400
+        
+        if not validate_single_phone_number(phone_number):
+            return jsonify({
+                'success': False,
+                'error': 'A valid phone number is required'
+            }), 400
+        
+        result = get_sms_service().send_transactional_sms(message, phone_number)
+        return jsonify(result), 200 if result['success'] else 502
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in send_transactional: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/suppression', methods=['GET'])
+def suppression_status():
+    """Show the size and state of the opt-out suppression list"""
+    suppression_list.refresh()
+    return jsonify({'success': True, **suppression_list.get_status()})
+
+@app.route('/suppression', methods=['POST'])
+def add_suppressed_numbers():
+    """Add opted-out numbers from pasted numbers and/or a CSV upload"""
+    try:
+        reason = request.form.get('reason', '').strip() or 'Opted out'
+        try:
+            phone_numbers = collect_phone_numbers()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        valid_numbers, invalid_numbers, duplicates = normalize_phone_numbers(phone_numbers)
+        
+        existing = set()
+        for i in range(0, len(valid_numbers), 500):
+            rows = db.session.query(SuppressedNumber.phone_number).filter(
+                SuppressedNumber.phone_number.in_(valid_numbers[i:i + 500])
+            ).all()
+            existing.update(row[0] for row in rows)
+        
+        now = datetime.utcnow()
+        new_numbers = [number for number in valid_numbers if number not in existing]
+        if new_numbers:
+            db.session.execute(SuppressedNumber.__table__.insert(), [
+                {'phone_number': number, 'reason': reason, 'created_at': now}
+                for number in new_numbers
+            ])
+        db.session.commit()
+        
+        # Make the numbers visible to this worker right away
+        suppression_list.add(new_numbers)
+        
+        return jsonify({
+            'success': True,
+            'suppressed': len(new_numbers),
+            'duplicates': duplicates + len(existing),
+            'invalid_numbers': len(invalid_numbers),
+            'invalid_numbers_list': invalid_numbers[:10]
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in add_suppressed_numbers: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/suppression/remove', methods=['POST'])
+def remove_suppressed_numbers():
+    """Remove numbers from the suppression list so they can be messaged again"""
+    try:
+        try:
+            phone_numbers = collect_phone_numbers()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        valid_numbers, invalid_numbers, _ = normalize_phone_numbers(phone_numbers)
+        
+        removed = []
+        for i in range(0, len(valid_numbers), 500):
+            batch = valid_numbers[i:i + 500]
+            rows = db.session.query(SuppressedNumber.phone_number).filter(
+                SuppressedNumber.phone_number.in_(batch)
+            ).all()
+            removed.extend(row[0] for row in rows)
+            SuppressedNumber.query.filter(
+                SuppressedNumber.phone_number.in_(batch)
+            ).delete(synchronize_session=False)
+        
+        # Other workers drop the numbers on their next refresh
+        now = datetime.utcnow()
+        if removed:
+            db.session.execute(SuppressionRemoval.__table__.insert(), [
+                {'phone_number': number, 'removed_at': now} for number in removed
+            ])
+        db.session.commit()
+        
+        # Make the removal visible to this worker right away
+        suppression_list.remove(removed)
+        
+        return jsonify({
+            'success': True,
+            'removed': len(removed),
+            'invalid_numbers': len(invalid_numbers)
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in remove_suppressed_numbers: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+def parse_schedule_time(value):
+    """Parse an ISO 8601 send time into a naive UTC datetime"""
+    send_at = datetime.fromisoformat(value)
+    if send_at.tzinfo is not None:
+        send_at = send_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return send_at
+
+@app.route('/schedule_campaign', methods=['POST'])
+def schedule_campaign():
+    """Queue a campaign to be sent later, optionally spread over a daily send window"""
+    try:
+        message = request.form.get('message', '').strip()
+        contact_list_id = request.form.get('contact_list_id', type=int)
+        send_at_text = request.form.get('send_at', '').strip()
+        window_start_text = request.form.get('window_start', '').strip()
+        window_end_text = request.form.get('window_end', '').strip()
+        
+        # Validate message
+        if not message:
+            return jsonify({
+                'success': False,
+                'error': 'Message is required'
+            }), 400
+            
+        if len(message) > 1600:  # SMS length limit
+            return jsonify({
+                'success': False,
+                'error': 'Message is too long. Maximum 1600 characters allowed.'
+            }), 400
+        
+        # Validate timing
+        try:
+            send_at = parse_schedule_time(send_at_text) if send_at_text else datetime.utcnow()
+            window_start = dt_time.fromisoformat(window_start_text) if window_start_text else None
+            window_end = dt_time.fromisoformat(window_end_text) if window_end_text else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid send_at or window time. Use ISO 8601, e.g. 2025-01-31T09:00 and 08:00'
+            }), 400
+        
+        if (window_start is None) != (window_end is None) or (window_start is not None and window_start == window_end):
+            return jsonify({
+                'success': False,
+                'error': 'A send window needs different window_start and window_end times'
+            }), 400
+        
+        # Collect recipients
+        try:
+            phone_numbers = collect_phone_numbers()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if contact_list_id is not None:
+            if phone_numbers:
+                return jsonify({
+                    'success': False,
+                    'error': 'Provide either a contact list or phone numbers, not both'
+                }), 400
+            contact_list = db.session.get(ContactList, contact_list_id)
+            if contact_list is None:
+                return jsonify({
+                    'success': False,
+                    'error': f'Contact list {contact_list_id} not found'
+                }), 404
+            valid_numbers, invalid_numbers = [], []
+            network_counts = count_contact_list_networks(contact_list_id)
+        else:
+            valid_numbers, invalid_numbers, _ = normalize_phone_numbers(phone_numbers)
+            network_counts = count_by_network(valid_numbers)
+        total_recipients = sum(network_counts.values())
+        
+        if not total_recipients:
+            return jsonify({
+                'success': False,
+                'error': 'No valid phone numbers found'
+            }), 400
+        
+        # Scheduled campaigns are sent in chunks, so only the message size is limited
+        estimate = cost_estimator.estimate(message, network_counts)
+        limit_error = cost_estimator.check_limits(estimate, check_cost=False)
+        if limit_error:
+            return jsonify({
+                'success': False,
+                'error': limit_error,
+                'estimate': estimate
+            }), 400
+        
+        start_at = next_send_time(max(send_at, datetime.utcnow()), window_start, window_end)
+        total_chunks, chunk_interval = plan_chunks(total_recipients, start_at, window_start, window_end)
+        
+        # The campaign is created now so it shows up in the campaign list
+        campaign = SMSCampaign()
+        campaign.message = message
+        campaign.total_recipients = total_recipients + len(invalid_numbers)
+        campaign.invalid_numbers = len(invalid_numbers)
+        campaign.status = SMSStatus.SCHEDULED
+        db.session.add(campaign)
+        db.session.flush()  # Get the campaign ID
+        
+        for invalid_number in invalid_numbers:
+            invalid_record = InvalidPhoneNumber()
+            invalid_record.campaign_id = campaign.id
+            invalid_record.phone_number = invalid_number
+            invalid_record.reason = 'Invalid format'
+            db.session.add(invalid_record)
+        
+        scheduled = ScheduledCampaign()
+        scheduled.campaign_id = campaign.id
+        scheduled.message = message
+        scheduled.contact_list_id = contact_list_id
+        scheduled.phone_numbers = '\n'.join(valid_numbers) if valid_numbers else None
+        scheduled.start_at = start_at
+        scheduled.window_start = window_start
+        scheduled.window_end = window_end
+        scheduled.chunk_size = (total_recipients + total_chunks - 1) // total_chunks
+        scheduled.total_chunks = total_chunks
+        scheduled.chunk_interval = chunk_interval
+        scheduled.chunks_done = 0
+        db.session.add(scheduled)
+        db.session.commit()
+        
+        campaign_scheduler.schedule(scheduled.id, start_at)
+        
+        return jsonify({
+            'success': True,
+            'scheduled_campaign_id': scheduled.id,
+            'campaign_id': campaign.id,
+            'start_at': start_at.isoformat(),
+            'total_recipients': total_recipients,
+            'invalid_numbers': len(invalid_numbers),
+            'invalid_numbers_list': invalid_numbers[:10],
+            'total_chunks': total_chunks,
+            'chunk_interval_seconds': round(chunk_interval, 2),
+            'estimated_cost': estimate['estimated_cost']
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in schedule_campaign: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'An unexpected error occurred: {str(e)}'
+        }), 500
+
+@app.route('/scheduled_campaigns')
+def scheduled_campaigns():
+    """List scheduled campaigns that have not finished yet"""
+    pending = ScheduledCampaign.query.filter(
+        ScheduledCampaign.status.in_([ScheduleStatus.SCHEDULED.value, ScheduleStatus.RUNNING.value])
+    ).order_by(ScheduledCampaign.start_at).limit(200).all()
+    
+    return jsonify({
+        'success': True,
+        'scheduled_campaigns': [{
+            'id': scheduled.id,
+            'campaign_id': scheduled.campaign_id,
+            'status': scheduled.status,
+            'start_at': scheduled.start_at.isoformat(),
+            'next_chunk_at': scheduled.next_chunk_at().isoformat(),
+            'window_start': scheduled.window_start.isoformat() if scheduled.window_start else None,
+            'window_end': scheduled.window_end.isoformat() if scheduled.window_end else None,
+            'chunks_done': scheduled.chunks_done,
+            'total_chunks': scheduled.total_chunks
+        } for scheduled in pending]
+    })
+
+@app.route('/scheduled_campaigns/<int:scheduled_id>/cancel', methods=['POST'])
+def cancel_scheduled_campaign(scheduled_id):
+    """Stop a scheduled campaign; chunks already sent stay sent"""
+    cancelled = ScheduledCampaign.query.filter(
+        ScheduledCampaign.id == scheduled_id,
+        ScheduledCampaign.status.in_([ScheduleStatus.SCHEDULED.value, ScheduleStatus.RUNNING.value])
+    ).update({'status': ScheduleStatus.CANCELLED.value}, synchronize_session=False)
+    
+    if not cancelled:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Scheduled campaign not found or already finished'
+        }), 404
+    
+    scheduled = db.session.get(ScheduledCampaign, scheduled_id)
+    scheduled.campaign.status = SMSStatus.CANCELLED
+    scheduled.campaign.completed_at = datetime.utcnow()
+    db.session.commit()
+    
+    return jsonify({'success': True, 'scheduled_campaign_id': scheduled_id})
+
+def get_recent_campaigns():
+    return read_session.query(SMSCampaign).order_by(SMSCampaign.created_at.desc()).limit(50).all()
+
 @app.route('/campaigns')
+@cached_view
 def campaigns():
     """View all SMS campaigns"""
-    campaigns = SMSCampaign.query.order_by(SMSCampaign.created_at.desc()).limit(50).all()
-    return render_template('campaigns.html', campaigns=campaigns)
+    return render_template('campaigns.html', campaigns=get_recent_campaigns())
+
+@app.route('/campaigns.json')
+@cached_view
+def campaigns_json():
+    """Recent SMS campaigns as JSON"""
+    return jsonify({
+        'success': True,
+        'campaigns': [{
+            'id': campaign.id,
+            'message': campaign.message,
+            'total_recipients': campaign.total_recipients,
+            'successful_sends': campaign.successful_sends,
+            'failed_sends': campaign.failed_sends,
+            'invalid_numbers': campaign.invalid_numbers,
+            'total_cost': campaign.total_cost,
+            'status': campaign.status,
+            'created_at': campaign.created_at.isoformat(),
+            'completed_at': campaign.completed_at.isoformat() if campaign.completed_at else None
+        } for campaign in get_recent_campaigns()]
+    })
 
 @app.route('/campaign/<int:campaign_id>')
 def campaign_details(campaign_id):
     """View details of a specific campaign"""
-    campaign = SMSCampaign.query.get_or_404(campaign_id)
-    sms_records = SMSRecord.query.filter_by(campaign_id=campaign_id).all()
-    invalid_numbers = InvalidPhoneNumber.query.filter_by(campaign_id=campaign_id).all()
+    campaign = read_session.get(SMSCampaign, campaign_id) or abort(404)
+    archived = read_session.get(ArchivedCampaign, campaign_id)
+    if archived is not None:
+        # Old campaigns are read back from their cold-storage file
+        sms_records, invalid_numbers = load_archived_campaign(archived.path)
+    else:
+        sms_records = read_session.query(SMSRecord).filter_by(campaign_id=campaign_id).all()
+        invalid_numbers = read_session.query(InvalidPhoneNumber).filter_by(campaign_id=campaign_id).all()
     
     return render_template('campaign_details.html', 
                          campaign=campaign, 
                          sms_records=sms_records,
                          invalid_numbers=invalid_numbers)
 
-@app.route('/statistics')
-def statistics():
-    """View SMS statistics"""
+@app.route('/campaign/<int:campaign_id>/export')
+def export_campaign(campaign_id):
+    """Download a campaign's SMS records and invalid numbers as CSV"""
+    import io
+    
+    read_session.get(SMSCampaign, campaign_id) or abort(404)
+    archived = read_session.get(ArchivedCampaign, campaign_id)
+    columns = ('type',) + RECORD_FIELDS + ('reason',)
+    
+    def rows():
+        if archived is not None:
+            for row in iter_archived_rows(archived.path):
+                yield row.type, row
+            return
+        records = read_session.query(SMSRecord).filter_by(campaign_id=campaign_id).order_by(SMSRecord.id)
+        for record in records.yield_per(1000):
+            yield 'record', record
+        for invalid in read_session.query(InvalidPhoneNumber).filter_by(campaign_id=campaign_id).order_by(InvalidPhoneNumber.id):
+            yield 'invalid', invalid
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for kind, row in rows():
+            if kind == 'record':
+                values = [getattr(row, field) for field in RECORD_FIELDS] + [None]
+            else:
+                values = [row.phone_number, 'invalid', None, None, None, None, row.created_at, row.reason]
+            writer.writerow([kind] + ['' if value is None else value for value in values])
+            # Send the file in chunks instead of one row at a time
+            if buffer.tell() > 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=campaign_{campaign_id}.csv'}
+    )
+
+def get_statistics():
+    """Return (daily statistics for the last 30 days, overall statistics)"""
     from sqlalchemy import func
     
     # Daily statistics for the last 30 days
-    daily_stats = SMSStatistics.query.order_by(SMSStatistics.date.desc()).limit(30).all()
+    daily_stats = read_session.query(SMSStatistics).order_by(SMSStatistics.date.desc()).limit(30).all()
     
     # Overall statistics
-    total_campaigns = SMSCampaign.query.count()
-    total_messages = db.session.query(func.sum(SMSCampaign.successful_sends + SMSCampaign.failed_sends)).scalar() or 0
-    total_successful = db.session.query(func.sum(SMSCampaign.successful_sends)).scalar() or 0
-    total_cost = db.session.query(func.sum(SMSCampaign.total_cost)).scalar() or 0.0
+    total_campaigns = read_session.query(SMSCampaign).count()
+    total_messages = read_session.query(func.sum(SMSCampaign.successful_sends + SMSCampaign.failed_sends)).scalar() or 0
+    total_successful = read_session.query(func.sum(SMSCampaign.successful_sends)).scalar() or 0
+    total_cost = read_session.query(func.sum(SMSCampaign.total_cost)).scalar() or 0.0
     
     overall_stats = {
         'total_campaigns': total_campaigns,
@@ -314,20 +1484,47 @@ def statistics():
         'total_cost': total_cost,
         'success_rate': round((total_successful / total_messages * 100), 2) if total_messages > 0 else 0
     }
-    
+    return daily_stats, overall_stats
+
+@app.route('/statistics')
+@cached_view
+def statistics():
+    """View SMS statistics"""
+    daily_stats, overall_stats = get_statistics()
     return render_template('statistics.html', 
                          daily_stats=daily_stats,
                          overall_stats=overall_stats)
 
+@app.route('/statistics.json')
+@cached_view
+def statistics_json():
+    """SMS statistics as JSON"""
+    daily_stats, overall_stats = get_statistics()
+    return jsonify({
+        'success': True,
+        'overall': overall_stats,
+        'daily': [{
+            'date': stats.date.isoformat(),
+            'total_campaigns': stats.total_campaigns,
+            'total_messages_sent': stats.total_messages_sent,
+            'total_successful': stats.total_successful,
+            'total_failed': stats.total_failed,
+            'total_cost': stats.total_cost
+        } for stats in daily_stats]
+    })
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
+    sms_service = get_sms_service()
     return jsonify({
         'status': 'healthy', 
         'service': 'SMS Broadcasting App', 
         'database': 'connected',
         'sms_environment': 'sandbox' if sms_service.username == 'sandbox' else 'production',
-        'api_configured': bool(sms_service.api_key and sms_service.api_key != 'your-api-key-here')
+        'api_configured': bool(sms_service.api_key and sms_service.api_key != 'your-api-key-here'),
+        'transactional_latency_ms': sms_service.dispatcher.priority_latency.get_percentiles(),
+        'response_cache': response_cache.get_status()
     })
 
 if __name__ == '__main__':
@@ -0,0 +1,137 @@
+import os
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Campaigns older than this are moved out of the hot tables
+DEFAULT_RETENTION_DAYS = 90
+
+# Rows read from the database per round trip while writing an archive
+_ARCHIVE_BATCH_SIZE = 5000
+
+# Columns kept for each archived row
+RECORD_FIELDS = ('phone_number', 'status', 'message_id', 'cost', 'error_message', 'sent_at', 'created_at')
+INVALID_FIELDS = ('phone_number', 'reason', 'created_at')
+_DATETIME_FIELDS = ('sent_at', 'created_at')
+
+
+def get_archive_dir() -> str:
+    from app import app
+
+    return os.environ.get("ARCHIVE_DIR") or os.path.join(app.instance_path, "archive")
+
+
+def archive_path(campaign_id: int) -> str:
+    return os.path.join(get_archive_dir(), f"campaign_{campaign_id}.jsonl.gz")
+
+
+def _serialize(row: Any, fields: Tuple[str, ...], kind: str) -> str:
+    data = {'type': kind}
+    for field in fields:
+        value = getattr(row, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(data, separators=(',', ':'))
+
+
+def archive_campaign(campaign_id: int) -> Dict[str, Any]:
+    """Write a campaign's SMS records and invalid numbers to its archive file, then delete them.
+
+    The file is written to a temporary name and renamed into place before
+    the rows are deleted, so a crash never loses rows; re-running simply
+    rewrites the file. Campaign totals on SMSCampaign are left untouched.
+    """
+    from app import db, SMSRecord, InvalidPhoneNumber, ArchivedCampaign
+
+    path = archive_path(campaign_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+
+    record_count = invalid_count = 0
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as archive_file:
+        records = SMSRecord.query.filter_by(campaign_id=campaign_id).order_by(SMSRecord.id)
+        for record in records.yield_per(_ARCHIVE_BATCH_SIZE):
+            archive_file.write(_serialize(record, RECORD_FIELDS, 'record') + '\n')
+            record_count += 1
+
+        invalid_numbers = InvalidPhoneNumber.query.filter_by(campaign_id=campaign_id).order_by(InvalidPhoneNumber.id)
+        for invalid in invalid_numbers.yield_per(_ARCHIVE_BATCH_SIZE):
+            archive_file.write(_serialize(invalid, INVALID_FIELDS, 'invalid') + '\n')
+            invalid_count += 1
+
+    os.replace(temp_path, path)
+
+    archived = ArchivedCampaign()
+    archived.campaign_id = campaign_id
+    archived.path = path
+    archived.record_count = record_count
+    archived.invalid_count = invalid_count
+    db.session.add(archived)
+    SMSRecord.query.filter_by(campaign_id=campaign_id).delete(synchronize_session=False)
+    InvalidPhoneNumber.query.filter_by(campaign_id=campaign_id).delete(synchronize_session=False)
+    db.session.commit()
+
+    return {
+        'campaign_id': campaign_id,
+        'path': path,
+        'records': record_count,
+        'invalid_numbers': invalid_count,
+        'bytes': os.path.getsize(path)
+    }
+
+
+def find_campaigns_to_archive(retention_days: int, limit: Optional[int] = None) -> List[int]:
+    """Return ids of finished campaigns created before the retention window that are not archived yet"""
+    from app import db, SMSCampaign, SMSStatus, ScheduledCampaign, ScheduleStatus, ArchivedCampaign
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    active_schedules = db.session.query(ScheduledCampaign.campaign_id).filter(
+        ScheduledCampaign.status.in_([ScheduleStatus.SCHEDULED.value, ScheduleStatus.RUNNING.value])
+    )
+    query = db.session.query(SMSCampaign.id).outerjoin(
+        ArchivedCampaign, ArchivedCampaign.campaign_id == SMSCampaign.id
+    ).filter(
+        SMSCampaign.created_at < cutoff,
+        SMSCampaign.status != SMSStatus.SCHEDULED.value,
+        ArchivedCampaign.campaign_id.is_(None),
+        SMSCampaign.id.notin_(active_schedules)
+    ).order_by(SMSCampaign.id).limit(limit)
+    return [campaign_id for (campaign_id,) in query]
+
+
+def archive_old_campaigns(retention_days: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Archive every finished campaign older than the retention window (ARCHIVE_RETENTION_DAYS)"""
+    if retention_days is None:
+        retention_days = int(os.environ.get("ARCHIVE_RETENTION_DAYS", DEFAULT_RETENTION_DAYS))
+
+    archived = []
+    for campaign_id in find_campaigns_to_archive(retention_days, limit):
+        result = archive_campaign(campaign_id)
+        logging.info(f"Archived campaign {campaign_id}: {result['records']} records, "
+                     f"{result['invalid_numbers']} invalid numbers, {result['bytes']} bytes")
+        archived.append(result)
+    return archived
+
+
+def _load_row(data: Dict[str, Any]) -> SimpleNamespace:
+    for field in _DATETIME_FIELDS:
+        if data.get(field):
+            data[field] = datetime.fromisoformat(data[field])
+    return SimpleNamespace(**data)
+
+
+def iter_archived_rows(path: str) -> Iterator[SimpleNamespace]:
+    """Stream the rows of a campaign archive; each has a `type` of 'record' or 'invalid'"""
+    with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+        for line in archive_file:
+            yield _load_row(json.loads(line))
+
+
+def load_archived_campaign(path: str) -> Tuple[List[SimpleNamespace], List[SimpleNamespace]]:
+    """Read a campaign archive as (sms_records, invalid_numbers), attribute-compatible with the models"""
+    sms_records, invalid_numbers = [], []
+    for row in iter_archived_rows(path):
+        (sms_records if row.type == 'record' else invalid_numbers).append(row)
+    return sms_records, invalid_numbers
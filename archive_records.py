@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""
+Archive old SMS records for the Bulk SMS Broadcasting Application.
+
+Moves the SMS records and invalid numbers of finished campaigns older than
+the retention window (ARCHIVE_RETENTION_DAYS, default 90) into compressed
+per-campaign files under ARCHIVE_DIR, and deletes them from the database.
+Campaign totals are kept. Run it periodically, e.g. daily from cron:
+
+    python archive_records.py [retention_days]
+"""
+
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+def archive_records(retention_days=None):
+    """Archive campaigns older than the retention window."""
+    from app import app
+    from archive import archive_old_campaigns
+    
+    with app.app_context():
+        archived = archive_old_campaigns(retention_days)
+        total_records = sum(result['records'] for result in archived)
+        print(f"Archived {len(archived)} campaigns ({total_records} SMS records)")
+
+if __name__ == "__main__":
+    archive_records(int(sys.argv[1]) if len(sys.argv) > 1 else None)
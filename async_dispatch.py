@@ -0,0 +1,167 @@
+import os
+import asyncio
+import logging
+import queue
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dispatcher import NetworkDispatcher, error_log
+
+# Provider requests allowed in flight at once across all campaigns
+DEFAULT_MAX_IN_FLIGHT = 1000
+
+
+class AsyncSMSClient:
+    """Asyncio counterpart of SMSService.send_batch_sms.
+
+    Builds and parses provider requests through the service, so both
+    clients talk to the provider the same way. `aiohttp` is only imported
+    when async dispatch is enabled.
+    """
+
+    def __init__(self, sms_service, max_in_flight: int):
+        self.sms_service = sms_service
+        self.max_in_flight = max_in_flight
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None:
+            import aiohttp
+
+            # SSL verification disabled to match the blocking client - FOR TESTING ONLY
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight, ssl=False)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        return self._session
+
+    async def send_batch_sms(self, message: str, phone_numbers: List[str]) -> List[Dict[str, Any]]:
+        """Send SMS to phone numbers in one provider request without blocking the event loop"""
+        service = self.sms_service
+        try:
+            url, headers, data = service._build_send_request(message, ','.join(phone_numbers))
+            session = await self._get_session()
+            async with session.post(url, headers=headers, data=data) as response:
+                response_text = await response.text()
+                response_data = await response.json(content_type=None) if response.status in (200, 201) else None
+            return service._parse_batch_response(phone_numbers, response.status, response_data, response_text)
+        except Exception as api_error:
+            error_log.error("Async API call error: %s", api_error)
+            # Fall back to simulating the SMS for testing, like the blocking client
+            error_log.warning("API call failed, simulating SMS for testing")
+            return [service._simulated_fallback(phone_number) for phone_number in phone_numbers]
+
+    async def simulate_batch_sms(self, message: str, phone_numbers: List[str]) -> List[Dict[str, Any]]:
+        """Simulate a provider send without blocking the event loop"""
+        from sms_service import SIMULATED_SEND_DELAY
+
+        await asyncio.sleep(SIMULATED_SEND_DELAY)
+        return [self.sms_service._simulated_result(phone_number) for phone_number in phone_numbers]
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncNetworkDispatcher(NetworkDispatcher):
+    """NetworkDispatcher that keeps sends in flight on one asyncio event loop.
+
+    The loop runs in a background thread shared by every campaign in the
+    process. Per-network feeders pace sends with the same rate limiters as
+    the threaded dispatcher and start each send as a task, so thousands of
+    requests can be waiting on the provider at once without a thread each.
+    Results are handed back to the calling thread, which keeps ownership of
+    the SQLAlchemy session.
+    """
+
+    def __init__(self, sms_service, max_in_flight: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        if max_in_flight is None:
+            max_in_flight = int(os.environ.get("SMS_ASYNC_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT))
+        self.max_in_flight = max_in_flight
+        self.client = AsyncSMSClient(sms_service, max_in_flight)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the event loop thread on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    self._in_flight = asyncio.Semaphore(self.max_in_flight)
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=run, daemon=True, name="sms-async-dispatch").start()
+                ready.wait()
+                self._loop = loop
+                logging.info(f"Async SMS dispatch loop started (max {self.max_in_flight} in flight)")
+            return self._loop
+
+    def get_async_sender(self, simulated: bool) -> Callable[[str, List[str]], Awaitable[List[Dict[str, Any]]]]:
+        return self.client.simulate_batch_sms if simulated else self.client.send_batch_sms
+
+    def dispatch(self, groups: List[Tuple[str, List[Tuple[Any, str]]]],
+                 send_batch: Callable[[str, List[str]], Awaitable[List[Dict[str, Any]]]]) -> Iterator[Tuple[Any, str, Dict[str, Any]]]:
+        """Send each (message, [(key, phone_number), ...]) group with the async `send_batch`.
+
+        Yields (key, network, result) in completion order. If the caller
+        stops iterating, the feeders start no further batches.
+        """
+        batches = self.plan_batches(groups)
+        total = sum(len(items) for _, items in groups)
+
+        results: "queue.Queue[Optional[Tuple[Any, str, Dict[str, Any]]]]" = queue.Queue()
+        cancelled = threading.Event()
+        future = asyncio.run_coroutine_threadsafe(self._dispatch_async(batches, send_batch, results, cancelled),
+                                                  self._get_loop())
+        # Unblock the caller if the dispatch coroutine itself fails
+        future.add_done_callback(lambda f: not f.cancelled() and f.exception() is not None and results.put(None))
+
+        try:
+            for _ in range(total):
+                item = results.get()
+                if item is None:
+                    raise future.exception()
+                yield item
+        finally:
+            cancelled.set()
+
+    async def _dispatch_async(self, batches: Dict[str, List[Tuple[str, List[Tuple[Any, str]]]]],
+                              send_batch: Callable[[str, List[str]], Awaitable[List[Dict[str, Any]]]],
+                              results: "queue.Queue", cancelled: threading.Event) -> None:
+        async def send_one(message: str, network: str, batch: List[Tuple[Any, str]]) -> None:
+            phone_numbers = [phone_number for _, phone_number in batch]
+            try:
+                batch_results = await send_batch(message, phone_numbers)
+            except Exception as e:
+                error_log.error("Error sending SMS to %d recipients on %s: %s", len(batch), network, e)
+                batch_results = [{'success': False, 'error': str(e), 'phone_number': phone_number}
+                                 for phone_number in phone_numbers]
+            finally:
+                self._in_flight.release()
+            for (key, _), result in zip(batch, batch_results):
+                results.put((key, network, result))
+
+        async def feed(network: str, network_batches: List[Tuple[str, List[Tuple[Any, str]]]]) -> None:
+            # Reserving one batch at a time lets concurrent campaigns interleave
+            limiter = self.get_limiter(network)
+            tasks = []
+            for message, batch in network_batches:
+                if cancelled.is_set():
+                    break
+                delay = limiter.reserve(len(batch))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._in_flight.acquire()
+                if cancelled.is_set():
+                    self._in_flight.release()
+                    break
+                tasks.append(asyncio.create_task(send_one(message, network, batch)))
+            await asyncio.gather(*tasks)
+
+        await asyncio.gather(*(feed(network, network_batches) for network, network_batches in batches.items()))
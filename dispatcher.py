@@ -0,0 +1,218 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from logging_config import SampledLog
+from utils import get_phone_network, parse_network_values
+
+# Rate-limited log for per-message send errors
+error_log = SampledLog()
+
+# Default sends per second per network; matches the old 0.1s delay between sends
+DEFAULT_NETWORK_RATE = 10.0
+
+# Share of each network's rate reserved for the transactional priority lane
+DEFAULT_PRIORITY_SHARE = 0.2
+
+# Transactional sends allowed back to back before the priority rate applies
+DEFAULT_PRIORITY_BURST = 5
+
+# Recipients of the same text and network sent in one provider request
+DEFAULT_BATCH_SIZE = 100
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to at most `rate` per second.
+
+    Up to `burst` calls may go through back to back after an idle period.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        # Start with the full burst available
+        self._next_slot = time.monotonic() - (self.burst - 1) * self.interval
+
+    def reserve(self, count: int = 1) -> float:
+        """Reserve the next `count` call slots and return the seconds to wait for the first"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now - (self.burst - 1) * self.interval)
+            self._next_slot = slot + count * self.interval
+        return max(0.0, slot - now)
+
+    def acquire(self, count: int = 1) -> None:
+        """Block until the caller may make its next `count` calls"""
+        delay = self.reserve(count)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LatencyTracker:
+    """Keeps recent latency samples and reports percentiles"""
+
+    def __init__(self, max_samples: int = 10000):
+        self._samples: "deque[float]" = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float) -> None:
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def get_percentiles(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {'count': 0, 'p50': None, 'p95': None, 'p99': None}
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+        return {
+            'count': len(samples),
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99)
+        }
+
+
+class NetworkDispatcher:
+    """Sends messages through one queue and rate limiter per mobile network.
+
+    Each network present in a send gets its own worker thread, so a slow or
+    congested network only delays its own recipients. Recipients of the same
+    text on the same network are sent up to `batch_size` per provider
+    request; rate limits still count recipients. Workers only talk to the
+    provider; results are handed back to the calling thread, which owns the
+    database session.
+
+    Limiters live in each process, so the configured rates are divided by
+    `processes` (WEB_CONCURRENCY, the number of app workers) to keep the
+    total across workers within them.
+    """
+
+    def __init__(self, default_rate: Optional[float] = None, rate_limits: Optional[Dict[str, float]] = None,
+                 priority_share: Optional[float] = None, batch_size: Optional[int] = None,
+                 processes: Optional[int] = None):
+        if default_rate is None:
+            default_rate = float(os.environ.get("SMS_RATE_LIMIT_PER_NETWORK", DEFAULT_NETWORK_RATE))
+        if rate_limits is None:
+            rate_limits = parse_network_values(os.environ.get("SMS_NETWORK_RATE_LIMITS", ""))
+        if priority_share is None:
+            priority_share = float(os.environ.get("SMS_PRIORITY_SHARE", DEFAULT_PRIORITY_SHARE))
+        self.default_rate = default_rate
+        self.rate_limits = rate_limits
+        if batch_size is None:
+            batch_size = int(os.environ.get("SMS_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        if processes is None:
+            processes = int(os.environ.get("WEB_CONCURRENCY", "1"))
+        self.priority_share = min(max(priority_share, 0.0), 0.9)
+        self.batch_size = max(1, batch_size)
+        self.processes = max(1, processes)
+        self.priority_latency = LatencyTracker()
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._priority_limiters: Dict[str, RateLimiter] = {}
+        self._limiters_lock = threading.Lock()
+
+    def get_rate(self, network: str) -> float:
+        """Return this process's share of a network's configured sends per second"""
+        return self.rate_limits.get(network, self.default_rate) / self.processes
+
+    def get_limiter(self, network: str) -> RateLimiter:
+        """Return the shared bulk limiter of a network, so concurrent campaigns share its budget"""
+        with self._limiters_lock:
+            limiter = self._limiters.get(network)
+            if limiter is None:
+                rate = self.get_rate(network) * (1 - self.priority_share)
+                limiter = RateLimiter(rate)
+                self._limiters[network] = limiter
+            return limiter
+
+    def get_priority_limiter(self, network: str) -> RateLimiter:
+        """Return the limiter of a network's reserved transactional share"""
+        with self._limiters_lock:
+            limiter = self._priority_limiters.get(network)
+            if limiter is None:
+                rate = self.get_rate(network) * self.priority_share
+                limiter = RateLimiter(rate, burst=DEFAULT_PRIORITY_BURST)
+                self._priority_limiters[network] = limiter
+            return limiter
+
+    def send_priority(self, message: str, phone_number: str,
+                      send: Callable[[str, str], Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Send one message in the calling thread through the priority lane.
+
+        Bypasses the bulk queues entirely, so it never waits behind a running
+        campaign. Returns (network, result).
+        """
+        network = get_phone_network(phone_number)
+        self.get_priority_limiter(network).acquire()
+        return network, send(message, phone_number)
+
+    def plan_batches(self, groups: List[Tuple[str, List[Tuple[Any, str]]]]) -> Dict[str, List[Tuple[str, List[Tuple[Any, str]]]]]:
+        """Split each (message, items) group into per-network provider batches"""
+        batches: Dict[str, List[Tuple[str, List[Tuple[Any, str]]]]] = {}
+        for message, items in groups:
+            by_network: Dict[str, List[Tuple[Any, str]]] = {}
+            for key, phone_number in items:
+                by_network.setdefault(get_phone_network(phone_number), []).append((key, phone_number))
+            for network, network_items in by_network.items():
+                network_batches = batches.setdefault(network, [])
+                for i in range(0, len(network_items), self.batch_size):
+                    network_batches.append((message, network_items[i:i + self.batch_size]))
+        return batches
+
+    def dispatch(self, groups: List[Tuple[str, List[Tuple[Any, str]]]],
+                 send_batch: Callable[[str, List[str]], List[Dict[str, Any]]]) -> Iterator[Tuple[Any, str, Dict[str, Any]]]:
+        """Send each (message, [(key, phone_number), ...]) group with `send_batch`.
+
+        `send_batch(message, phone_numbers)` returns one result per number.
+        Yields (key, network, result) in completion order. If the caller
+        stops iterating (e.g. its database commit fails), the workers send
+        no further batches.
+        """
+        batches = self.plan_batches(groups)
+        total = sum(len(items) for _, items in groups)
+
+        results: "queue.Queue[Tuple[Any, str, Dict[str, Any]]]" = queue.Queue()
+        cancelled = threading.Event()
+
+        def worker(network: str, network_batches: List[Tuple[str, List[Tuple[Any, str]]]]) -> None:
+            limiter = self.get_limiter(network)
+            for message, batch in network_batches:
+                if cancelled.is_set():
+                    return
+                limiter.acquire(len(batch))
+                if cancelled.is_set():
+                    return
+                phone_numbers = [phone_number for _, phone_number in batch]
+                try:
+                    batch_results = send_batch(message, phone_numbers)
+                except Exception as e:
+                    error_log.error("Error sending SMS to %d recipients on %s: %s", len(batch), network, e)
+                    batch_results = [{'success': False, 'error': str(e), 'phone_number': phone_number}
+                                     for phone_number in phone_numbers]
+                for (key, _), result in zip(batch, batch_results):
+                    results.put((key, network, result))
+
+        threads = [
+            threading.Thread(target=worker, args=(network, network_batches), daemon=True,
+                             name=f"sms-dispatch-{network.lower()}")
+            for network, network_batches in batches.items()
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for _ in range(total):
+                yield results.get()
+        finally:
+            # Runs when the caller stops early, too; nothing is sent unrecorded
+            cancelled.set()
+
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration for production.
+
+The app is imported once in the master and workers are forked from it, so
+a new or recycled worker starts without re-importing anything. Database
+schema setup runs once in the master before any worker exists. Provider
+clients start lazily inside each worker after the fork; the scheduler and
+other background threads start as soon as the worker is forked.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# Exported so each worker can take its share of the per-network rate limits
+os.environ.setdefault("WEB_CONCURRENCY", "2")
+workers = int(os.environ["WEB_CONCURRENCY"])
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+preload_app = True
+
+# Recycle workers periodically; cheap because workers are forked, not re-imported
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+
+
+def on_starting(server):
+    """Create database tables once, before workers are forked"""
+    from init_db import init_db
+    from app import app, db
+
+    init_db()
+    # Don't hand the master's pooled connections to the workers
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def post_fork(server, worker):
+    """Drop any connection objects inherited from the master without closing them,
+    then start the worker's background services without waiting for a request"""
+    from app import app, db, start_background_services
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    start_background_services()
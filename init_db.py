@@ -17,6 +17,11 @@ def init_db():
     with app.app_context():
         # Create all tables
         db.create_all()
+        # create_all skips tables that already exist, so indexes added to
+        # an existing table are created here
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
         print("Database tables created successfully!")
 
         # Print database URL (without sensitive information)
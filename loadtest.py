@@ -0,0 +1,518 @@
+#!/usr/bin/env python
+"""
+Load test for the Bulk SMS Broadcasting Application.
+
+Starts a stub SMS provider and the app on local ports, then sends a mix of
+/send_sms, campaign page and statistics requests from concurrent clients.
+Reports throughput, latency percentiles and error rates per endpoint. Each
+run is saved as JSON so it can be compared with an earlier one:
+
+    python loadtest.py --concurrency 20 --duration 30
+    python loadtest.py --compare loadtest_results/loadtest_20260101_120000.json
+
+By default the app runs in a subprocess under gunicorn with the production
+config (gunicorn.conf.py, wsgi:app), so the clients do not share a process
+or the GIL with it. --server embedded runs it in this process on Werkzeug's
+threaded server instead, which also reports time spent waiting on database
+write locks. --target-url tests an app that is already running.
+
+Runs against a fresh SQLite file unless --database-url is given (e.g. a
+local Postgres database). Sends go to the stub provider, never to Africa's
+Talking; with --target-url the target's own provider settings apply, so
+/send_sms is only load tested with --allow-sends.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from sqlalchemy.engine import make_url
+
+from dispatcher import LatencyTracker
+from utils import parse_network_values
+
+# Endpoint name -> (method, path)
+ENDPOINTS = {
+    'send_sms': ('POST', '/send_sms'),
+    'campaigns': ('GET', '/campaigns'),
+    'campaigns_json': ('GET', '/campaigns.json'),
+    'campaign_details': ('GET', '/campaign/{campaign_id}'),
+    'statistics': ('GET', '/statistics'),
+    'statistics_json': ('GET', '/statistics.json'),
+}
+DEFAULT_MIX = 'send_sms=2,campaigns=2,campaign_details=1,statistics=2,statistics_json=1'
+
+# Network prefixes used for generated recipients
+RECIPIENT_PREFIXES = ('24', '54', '55', '20', '50', '26', '27', '23')
+
+# Write statements slower than this are counted as waiting on a lock
+DEFAULT_LOCK_WAIT_THRESHOLD_MS = 50.0
+
+# Database errors raised when a lock could not be obtained (SQLite, Postgres)
+LOCK_ERRORS = ('database is locked', 'lock timeout', 'could not obtain lock', 'deadlock detected')
+
+# Seconds to wait for a gunicorn subprocess to answer /health
+SERVER_STARTUP_TIMEOUT = 60
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """Answers Africa's Talking send requests with a success for every recipient"""
+
+    latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        recipients = form.get('to', [''])[0].split(',')
+        if self.latency:
+            time.sleep(self.latency)
+
+        body = json.dumps({
+            'SMSMessageData': {
+                'Message': f'Sent to {len(recipients)}/{len(recipients)}',
+                'Recipients': [{
+                    'number': number,
+                    'status': 'Success',
+                    'statusCode': 101,
+                    'messageId': f'ATXid_loadtest_{random.getrandbits(48):x}',
+                    'cost': 'KES 0.8000'
+                } for number in recipients]
+            }
+        }).encode('utf-8')
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LockWaitMonitor:
+    """Times write statements on the app's write engine.
+
+    A writer blocked by another transaction (SQLite's database lock, a
+    Postgres row lock) spends the wait inside the statement, so write
+    statements slower than `threshold_ms` are counted as lock waits.
+    Statements that fail with a lock error are counted separately.
+    """
+
+    def __init__(self, engine, threshold_ms: float):
+        from sqlalchemy import event
+
+        self.threshold_ms = threshold_ms
+        self.write_latency = LatencyTracker(max_samples=1000000)
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.lock_errors = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    @staticmethod
+    def _is_write(statement):
+        return statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE')
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._is_write(statement):
+            conn.info['loadtest_write_start'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('loadtest_write_start', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.write_latency.record(elapsed_ms)
+        if elapsed_ms >= self.threshold_ms:
+            with self._lock:
+                self.lock_waits += 1
+                self.lock_wait_seconds += elapsed_ms / 1000
+
+    def _handle_error(self, context):
+        if context.connection is not None:
+            context.connection.info.pop('loadtest_write_start', None)
+        message = str(context.original_exception).lower()
+        if any(error in message for error in LOCK_ERRORS):
+            with self._lock:
+                self.lock_errors += 1
+
+    def get_report(self):
+        return {
+            'write_statements': self.write_latency.get_percentiles(),
+            'lock_wait_threshold_ms': self.threshold_ms,
+            'lock_waits': self.lock_waits,
+            'lock_wait_seconds': round(self.lock_wait_seconds, 3),
+            'lock_errors': self.lock_errors
+        }
+
+
+class EndpointStats:
+    """Latency samples and outcome counts of one endpoint; samples also go to `overall`"""
+
+    def __init__(self, overall):
+        self.overall = overall
+        self.latency = LatencyTracker(max_samples=1000000)
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.error_samples = []
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms, status, error=None):
+        self.latency.record(latency_ms)
+        self.overall.record(latency_ms)
+        with self._lock:
+            self.requests += 1
+            if status == 304:
+                self.not_modified += 1
+            if error is not None:
+                self.errors += 1
+                if len(self.error_samples) < 5:
+                    self.error_samples.append(error)
+
+    def get_report(self, duration):
+        report = self.latency.get_percentiles()
+        report.update({
+            'requests': self.requests,
+            'throughput_rps': round(self.requests / duration, 2) if duration else 0,
+            'errors': self.errors,
+            'error_rate': round(self.errors / self.requests * 100, 2) if self.requests else 0,
+            'not_modified': self.not_modified,
+            'error_samples': self.error_samples
+        })
+        return report
+
+
+def parse_mix(value):
+    """Parse endpoint weights such as "send_sms=2,statistics=1" """
+    mix = {name.lower(): weight for name, weight in parse_network_values(value).items() if weight > 0}
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}. Choose from: {', '.join(ENDPOINTS)}")
+    if not mix:
+        raise ValueError('The mix must give at least one endpoint a positive weight')
+    return mix
+
+
+def random_recipients(rng, count):
+    return '\n'.join(f'+233{rng.choice(RECIPIENT_PREFIXES)}{rng.randrange(10 ** 7):07d}' for _ in range(count))
+
+
+def start_server(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_client(base_url, mix, args, deadline, stats, campaign_ids, seed):
+    """Send requests from one simulated client until the deadline"""
+    import requests
+
+    rng = random.Random(seed)
+    session = requests.Session()
+    etags = {}
+    names, weights = zip(*mix.items())
+
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        if name == 'campaign_details' and not campaign_ids:
+            name = 'campaigns'
+        method, path = ENDPOINTS[name]
+        if name == 'campaign_details':
+            path = path.format(campaign_id=rng.choice(campaign_ids))
+
+        headers = {}
+        if method == 'GET' and args.etags and path in etags:
+            # Poll like a dashboard that keeps its last copy
+            headers['If-None-Match'] = etags[path]
+        data = None
+        if name == 'send_sms':
+            data = {'message': args.message, 'phone_numbers': random_recipients(rng, args.recipients)}
+
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, data=data, headers=headers, timeout=args.timeout)
+        except Exception as e:
+            stats[name].record((time.perf_counter() - started) * 1000, None, f'{type(e).__name__}: {e}')
+            continue
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        error = None
+        if response.status_code >= 400:
+            error = f'HTTP {response.status_code}: {response.text[:200]}'
+        elif name == 'send_sms':
+            result = response.json()
+            if result.get('failed_sends'):
+                error = f"{result['failed_sends']} of {result['valid_numbers']} sends failed"
+            campaign_ids.append(result['campaign_id'])
+        elif 'ETag' in response.headers:
+            etags[path] = response.headers['ETag']
+        stats[name].record(latency_ms, response.status_code, error)
+
+
+def get_git_version():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=APP_DIR, timeout=5)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def start_embedded_app(args):
+    """Serve the app from this process on Werkzeug's threaded server.
+
+    Returns (base URL, stop function, lock wait monitor).
+    """
+    import logging
+    from werkzeug.serving import make_server
+    from app import app, db
+
+    # The per-request access log would swamp the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        monitor = LockWaitMonitor(db.engine, args.lock_wait_threshold)
+    server = start_server(make_server('127.0.0.1', 0, app, threaded=True))
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown, monitor
+
+
+def start_gunicorn_app(args):
+    """Serve wsgi:app with the production gunicorn config in a subprocess.
+
+    Returns (base URL, stop function, None); write locks cannot be timed
+    from outside the app's processes.
+    """
+    import requests
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    # The environment set up in run_load_test is inherited
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+                                '--bind', f'127.0.0.1:{port}', 'wsgi:app'], cwd=APP_DIR)
+    base_url = f'http://127.0.0.1:{port}'
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    deadline = time.monotonic() + SERVER_STARTUP_TIMEOUT
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode} before it was ready')
+        try:
+            if requests.get(base_url + '/health', timeout=5).status_code == 200:
+                return base_url, stop, None
+        except requests.RequestException:
+            pass
+        if time.monotonic() > deadline:
+            stop()
+            raise RuntimeError(f'gunicorn did not answer /health within {SERVER_STARTUP_TIMEOUT}s')
+        time.sleep(0.2)
+
+
+def run_load_test(args):
+    mix = parse_mix(args.mix)
+    if args.target_url and 'send_sms' in mix and not args.allow_sends:
+        raise ValueError('With --target-url, /send_sms uses the target\'s own SMS provider. Point its '
+                         'AFRICAS_TALKING_API_URL at a stub and pass --allow-sends, or leave send_sms out of --mix')
+
+    provider = None
+    database_url = None
+    if args.target_url:
+        base_url, stop_app, monitor = args.target_url.rstrip('/'), None, None
+        print(f"Load testing {base_url} for {args.duration}s with {args.concurrency} clients")
+    else:
+        # Stub provider first, so the app is configured to send to it
+        StubProviderHandler.latency = args.provider_latency / 1000
+        provider = start_server(ThreadingHTTPServer(('127.0.0.1', 0), StubProviderHandler))
+        provider_url = f'http://127.0.0.1:{provider.server_port}/version1/messaging'
+
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='loadtest_'), 'loadtest.db')}"
+        # Set before the app is imported or started; load_dotenv() does not override these
+        os.environ['DATABASE_URL'] = database_url
+        os.environ['AFRICAS_TALKING_USERNAME'] = 'sandbox'
+        os.environ['AFRICAS_TALKING_API_KEY'] = 'loadtest'
+        os.environ['AFRICAS_TALKING_API_URL'] = provider_url
+        os.environ['SCHEDULER_ENABLED'] = 'False'
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        # Measure the app, not the provider rate limits, unless asked to
+        os.environ.setdefault('SMS_RATE_LIMIT_PER_NETWORK', '100000')
+
+        try:
+            if args.server == 'embedded':
+                base_url, stop_app, monitor = start_embedded_app(args)
+            else:
+                base_url, stop_app, monitor = start_gunicorn_app(args)
+        except Exception:
+            provider.shutdown()
+            raise
+        print(f"Load testing {base_url} ({args.server}) for {args.duration}s with {args.concurrency} clients "
+              f"({make_url(database_url).render_as_string(hide_password=True)})")
+    overall = LatencyTracker(max_samples=1000000)
+    stats = {name: EndpointStats(overall) for name in mix}
+    campaign_ids = []
+    started = time.monotonic()
+    deadline = started + args.duration
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            clients = [executor.submit(run_client, base_url, mix, args, deadline, stats, campaign_ids, args.seed + i)
+                       for i in range(args.concurrency)]
+            for client in clients:
+                client.result()
+        duration = time.monotonic() - started
+    finally:
+        if stop_app is not None:
+            stop_app()
+        if provider is not None:
+            provider.shutdown()
+
+    total_requests = sum(endpoint.requests for endpoint in stats.values())
+    total_errors = sum(endpoint.errors for endpoint in stats.values())
+    summary = overall.get_percentiles()
+    summary.update({
+        'requests': total_requests,
+        'throughput_rps': round(total_requests / duration, 2) if duration else 0,
+        'errors': total_errors,
+        'error_rate': round(total_errors / total_requests * 100, 2) if total_requests else 0
+    })
+
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'version': get_git_version(),
+        'config': {
+            'duration': args.duration,
+            'concurrency': args.concurrency,
+            'recipients_per_send': args.recipients,
+            'mix': mix,
+            'etags': args.etags,
+            'provider_latency_ms': args.provider_latency,
+            'server': 'target' if args.target_url else args.server,
+            'database': make_url(database_url).get_backend_name() if database_url else None
+        },
+        'overall': summary,
+        'endpoints': {name: endpoint.get_report(duration) for name, endpoint in stats.items()},
+        'database': monitor.get_report() if monitor is not None else None
+    }
+
+
+def print_report(report):
+    print()
+    print(f"{'endpoint':<18}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'304s':>8}")
+    rows = list(report['endpoints'].items()) + [('overall', report['overall'])]
+    for name, stats in rows:
+        print(f"{name:<18}{stats['requests']:>10}{stats['throughput_rps']:>10}"
+              f"{stats['p50'] or '-':>10}{stats['p95'] or '-':>10}{stats['p99'] or '-':>10}"
+              f"{stats['error_rate']:>8}%{stats.get('not_modified', ''):>8}")
+
+    database = report['database']
+    if database is not None:
+        writes = database['write_statements']
+        print()
+        print(f"DB writes: {writes['count']} statements, p50 {writes['p50']} ms, p95 {writes['p95']} ms, p99 {writes['p99']} ms")
+        print(f"DB lock waits (writes over {database['lock_wait_threshold_ms']} ms): {database['lock_waits']}, "
+              f"{database['lock_wait_seconds']}s total; lock errors: {database['lock_errors']}")
+
+    for name, stats in report['endpoints'].items():
+        for sample in stats['error_samples']:
+            print(f"  {name} error: {sample}")
+
+
+def print_comparison(report, previous):
+    """Print throughput and latency changes against an earlier run"""
+    print()
+    print(f"Compared with {previous.get('version') or 'unknown version'} ({previous.get('started_at')}):")
+
+    def change(new, old):
+        if not new or not old:
+            return '-'
+        return f'{(new - old) / old * 100:+.1f}%'
+
+    rows = [(name, stats, previous['endpoints'].get(name)) for name, stats in report['endpoints'].items()]
+    rows.append(('overall', report['overall'], previous['overall']))
+    print(f"{'endpoint':<18}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>10}")
+    for name, stats, old in rows:
+        if old is None:
+            continue
+        print(f"{name:<18}{change(stats['throughput_rps'], old['throughput_rps']):>10}"
+              f"{change(stats['p50'], old['p50']):>10}{change(stats['p95'], old['p95']):>10}"
+              f"{change(stats['p99'], old['p99']):>10}{stats['error_rate'] - old['error_rate']:>+9.2f}%")
+
+    if report['database'] is not None and previous.get('database') is not None:
+        lock_waits = report['database']['lock_waits'] - previous['database']['lock_waits']
+        print(f"DB lock waits: {lock_waits:+d}")
+
+
+def save_report(report, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the SMS app against a local stub provider.')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run (default 30)')
+    parser.add_argument('--concurrency', type=int, default=10, help='concurrent clients (default 10)')
+    parser.add_argument('--recipients', type=int, default=20, help='recipients per /send_sms request (default 20)')
+    parser.add_argument('--message', default='Load test message', help='text of each send')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'endpoint weights (default {DEFAULT_MIX})')
+    parser.add_argument('--no-etags', dest='etags', action='store_false',
+                        help="don't send If-None-Match on repeated page requests")
+    parser.add_argument('--provider-latency', type=float, default=20,
+                        help='milliseconds the stub provider takes per request (default 20)')
+    parser.add_argument('--server', choices=('gunicorn', 'embedded'), default='gunicorn',
+                        help='run the app under gunicorn in a subprocess, or in this process with '
+                             'database lock timing (default gunicorn)')
+    parser.add_argument('--target-url', help='load test an app already running at this URL instead of starting one')
+    parser.add_argument('--allow-sends', action='store_true',
+                        help="with --target-url, include /send_sms; sends use the target's provider settings")
+    parser.add_argument('--database-url', help='database to test against (default: a new SQLite file)')
+    parser.add_argument('--lock-wait-threshold', type=float, default=DEFAULT_LOCK_WAIT_THRESHOLD_MS,
+                        help=f'write statement time counted as a lock wait, in ms (default {DEFAULT_LOCK_WAIT_THRESHOLD_MS:g})')
+    parser.add_argument('--timeout', type=float, default=60, help='per-request timeout in seconds (default 60)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for recipients and the request mix')
+    parser.add_argument('--output-dir', default='loadtest_results', help='where to save results (default loadtest_results)')
+    parser.add_argument('--compare', help='earlier results file to compare this run with')
+    args = parser.parse_args(argv)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+
+    try:
+        report = run_load_test(args)
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+
+    print_report(report)
+    if previous is not None:
+        print_comparison(report, previous)
+    print()
+    print(f"Results saved to {save_report(report, args.output_dir)}")
+    return 1 if report['overall']['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
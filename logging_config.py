@@ -0,0 +1,149 @@
+import os
+import sys
+import atexit
+import queue
+import logging
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_stream_handler: Optional[logging.Handler] = None
+_fork_hook_registered = False
+_exit_hook_registered = False
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).lower() == "true"
+
+
+def configure_logging() -> None:
+    """Set up root logging from the environment.
+
+    LOG_LEVEL sets the level (default DEBUG). With LOG_ASYNC (default True)
+    records are put on an in-memory queue and written to stderr by a
+    background listener thread, so callers never block on log I/O. The
+    listener is restarted in forked children and drains the queue at exit.
+    """
+    global _listener, _queue_handler, _stream_handler, _fork_hook_registered, _exit_hook_registered
+
+    level = os.environ.get("LOG_LEVEL", "DEBUG").upper()
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    _stream_handler = logging.StreamHandler(sys.stderr)
+    _stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if not _env_flag("LOG_ASYNC", "True"):
+        root.handlers = [_stream_handler]
+        return
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = QueueHandler(log_queue)
+    root.handlers = [_queue_handler]
+    _listener = QueueListener(log_queue, _stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    # The listener thread is a daemon, so records still queued at exit are
+    # lost unless it is stopped (which writes them) first
+    if not _exit_hook_registered:
+        atexit.register(_stop_listener)
+        _exit_hook_registered = True
+
+    if hasattr(os, "register_at_fork") and not _fork_hook_registered:
+        os.register_at_fork(after_in_child=_restart_listener_in_child)
+        _fork_hook_registered = True
+
+
+def _restart_listener_in_child() -> None:
+    """Give a forked child its own queue and listener thread; the parent's thread does not survive fork"""
+    global _listener
+    if _queue_handler is None or _stream_handler is None:
+        return
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, _stream_handler, respect_handler_level=True)
+    _listener.start()
+    # The exit hook registered in the parent is inherited and stops this listener
+
+
+def _stop_listener() -> None:
+    """Write out any queued records and stop this process's listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class SampledLog:
+    """Rate-limited logging for per-message events on the send hot path.
+
+    At most `max_per_second` records are emitted per instance; the rest are
+    counted and reported with the next emitted record. Arguments are only
+    formatted for records that are emitted.
+    """
+
+    def __init__(self, max_per_second: Optional[float] = None):
+        if max_per_second is None:
+            max_per_second = float(os.environ.get("LOG_PER_MESSAGE_MAX_PER_SECOND", "5"))
+        self.max_per_second = max_per_second
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._emitted = 0
+        self._suppressed = 0
+
+    def log(self, level: int, msg: str, *args) -> None:
+        if not logging.getLogger().isEnabledFor(level):
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._emitted = 0
+            if self._emitted >= self.max_per_second:
+                self._suppressed += 1
+                return
+            self._emitted += 1
+            suppressed, self._suppressed = self._suppressed, 0
+
+        if suppressed:
+            msg += " (%d similar messages suppressed)"
+            args = args + (suppressed,)
+        logging.log(level, msg, *args)
+
+    def info(self, msg: str, *args) -> None:
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg: str, *args) -> None:
+        self.log(logging.WARNING, msg, *args)
+
+    def error(self, msg: str, *args) -> None:
+        self.log(logging.ERROR, msg, *args)
+
+
+class ProgressLog:
+    """Periodic aggregate progress line for a bulk send, instead of one line per N messages"""
+
+    def __init__(self, label: str, total: int, interval: Optional[float] = None):
+        if interval is None:
+            interval = float(os.environ.get("LOG_PROGRESS_INTERVAL", "5"))
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self._started = time.monotonic()
+        self._last = self._started
+
+    def update(self, processed: int, successful: int, failed: int) -> None:
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self._started
+        logging.info("%s: processed %d/%d (success %d, failed %d), %.1f msg/s",
+                     self.label, processed, self.total, successful, failed,
+                     processed / elapsed if elapsed > 0 else 0.0)
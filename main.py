@@ -1,9 +1,5 @@
 import os
-from dotenv import load_dotenv
-from app import app
-
-# Load environment variables from .env file
-load_dotenv()
+from app import app  # app.py loads the .env file
 
 if __name__ == "__main__":
     # Get port from environment variable or use default 5000
@@ -0,0 +1,118 @@
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from utils import get_phone_network, get_sms_segments, parse_network_values
+
+# Price per SMS part when no per-network price is set; matches the simulated cost
+DEFAULT_PRICE_PER_SEGMENT = 0.5
+
+
+def count_by_network(phone_numbers: Iterable[str]) -> Dict[str, int]:
+    """Count +233XXXXXXXXX phone numbers per mobile network"""
+    counts: Dict[str, int] = {}
+    for phone_number in phone_numbers:
+        network = get_phone_network(phone_number)
+        counts[network] = counts.get(network, 0) + 1
+    return counts
+
+
+class CostEstimator:
+    """Estimates what a campaign will cost before it is sent.
+
+    The estimate is SMS parts per message x recipients x the per-part price
+    of each recipient's network. Optional limits on parts per message and on
+    the cost of a single send let oversize campaigns be rejected up front.
+    """
+
+    def __init__(self, default_price: Optional[float] = None, network_prices: Optional[Dict[str, float]] = None,
+                 max_segments: Optional[int] = None, max_cost: Optional[float] = None):
+        if default_price is None:
+            default_price = float(os.environ.get("SMS_PRICE_PER_SEGMENT", DEFAULT_PRICE_PER_SEGMENT))
+        if network_prices is None:
+            network_prices = parse_network_values(os.environ.get("SMS_NETWORK_PRICES", ""))
+        if max_segments is None and os.environ.get("SMS_MAX_SEGMENTS"):
+            max_segments = int(os.environ["SMS_MAX_SEGMENTS"])
+        if max_cost is None and os.environ.get("MAX_CAMPAIGN_COST"):
+            max_cost = float(os.environ["MAX_CAMPAIGN_COST"])
+        self.default_price = default_price
+        self.network_prices = network_prices
+        self.currency = os.environ.get("SMS_PRICE_CURRENCY", "KES")
+        self.max_segments = max_segments
+        self.max_cost = max_cost
+
+    def estimate(self, message: str, network_counts: Dict[str, int]) -> Dict[str, Any]:
+        """Estimate the parts and cost of sending `message` to the given recipients per network"""
+        segments = get_sms_segments(message)
+        networks = {}
+        total_cost = 0.0
+        for network, recipients in sorted(network_counts.items()):
+            price = self.network_prices.get(network, self.default_price)
+            cost = segments['segments'] * recipients * price
+            networks[network] = {
+                'recipients': recipients,
+                'price_per_segment': price,
+                'cost': round(cost, 4)
+            }
+            total_cost += cost
+
+        recipients = sum(network_counts.values())
+        return {
+            'encoding': segments['encoding'],
+            'characters': len(message),
+            'units': segments['units'],
+            'segments_per_message': segments['segments'],
+            'units_per_segment': segments['per_segment'],
+            'units_remaining': segments['remaining'],
+            'recipients': recipients,
+            'total_segments': segments['segments'] * recipients,
+            'estimated_cost': round(total_cost, 2),
+            'currency': self.currency,
+            'networks': networks
+        }
+
+    def estimate_personalized(self, recipients: Iterable[Tuple[str, str]]) -> Dict[str, Any]:
+        """Estimate a campaign whose text differs per recipient; `recipients` yields (phone_number, text)"""
+        network_counts: Dict[str, int] = {}
+        network_segments: Dict[str, int] = {}
+        max_segments = 0
+        for phone_number, text in recipients:
+            network = get_phone_network(phone_number)
+            segments = get_sms_segments(text)['segments']
+            network_counts[network] = network_counts.get(network, 0) + 1
+            network_segments[network] = network_segments.get(network, 0) + segments
+            max_segments = max(max_segments, segments)
+
+        networks = {}
+        total_cost = 0.0
+        for network, segments in sorted(network_segments.items()):
+            price = self.network_prices.get(network, self.default_price)
+            networks[network] = {
+                'recipients': network_counts[network],
+                'segments': segments,
+                'price_per_segment': price,
+                'cost': round(segments * price, 4)
+            }
+            total_cost += segments * price
+
+        return {
+            'segments_per_message': max_segments,
+            'recipients': sum(network_counts.values()),
+            'total_segments': sum(network_segments.values()),
+            'estimated_cost': round(total_cost, 2),
+            'currency': self.currency,
+            'networks': networks
+        }
+
+    def check_limits(self, estimate: Dict[str, Any], check_cost: bool = True) -> Optional[str]:
+        """Return why a campaign with this estimate may not be sent, or None if it may"""
+        if self.max_segments and estimate['segments_per_message'] > self.max_segments:
+            return (f"Message is {estimate['segments_per_message']} SMS parts; "
+                    f"the limit is {self.max_segments}")
+        if check_cost and self.max_cost is not None and estimate['estimated_cost'] > self.max_cost:
+            return (f"Estimated cost {estimate['estimated_cost']:.2f} {self.currency} exceeds the limit of "
+                    f"{self.max_cost:.2f} {self.currency} per send. Schedule the campaign to send it in chunks.")
+        return None
+
+
+# Shared per-process estimator
+cost_estimator = CostEstimator()
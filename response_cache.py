@@ -0,0 +1,117 @@
+import os
+import hashlib
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from flask import Response, make_response, request
+
+# Rendered responses kept per process, and how long each stays fresh
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_TTL_SECONDS = 30.0
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    mimetype: str
+    etag: str
+    expires_at: float
+    generation: int
+
+
+class ResponseCache:
+    """Bounded in-memory cache of rendered responses with TTL and LRU eviction.
+
+    `invalidate()` drops every entry at once; it is called when the data
+    behind the cached views changes. Entries rendered while an invalidation
+    happened are never served, because each entry remembers the generation
+    it was rendered in.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        if max_entries is None:
+            max_entries = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        if ttl is None:
+            ttl = float(os.environ.get("RESPONSE_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic() or entry.generation != self.generation:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(self, key: str, body: bytes, mimetype: str, generation: int) -> CachedResponse:
+        """Store a response rendered during `generation`; returns the entry with its ETag"""
+        entry = CachedResponse(
+            body=body,
+            mimetype=mimetype,
+            # Content hash, so every worker gives the same ETag for the same data
+            etag=hashlib.sha1(body).hexdigest(),
+            expires_at=time.monotonic() + self.ttl,
+            generation=generation
+        )
+        if self.max_entries <= 0:
+            return entry
+
+        with self._lock:
+            if generation == self.generation:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self._hits,
+            'misses': self._misses
+        }
+
+
+# Shared per-process cache
+response_cache = ResponseCache()
+
+
+def cached_view(view: Callable) -> Callable:
+    """Serve a GET view from the response cache, answering If-None-Match with 304"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        entry = response_cache.get(key)
+        if entry is None:
+            generation = response_cache.generation
+            rendered = make_response(view(*args, **kwargs))
+            if rendered.status_code != 200:
+                return rendered
+            entry = response_cache.set(key, rendered.get_data(), rendered.mimetype, generation)
+
+        response = Response(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        # Let browsers and pollers keep a copy but check back each time
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    return wrapper
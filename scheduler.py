@@ -0,0 +1,247 @@
+import os
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, time as dt_time
+from typing import List, Optional, Tuple
+
+# Recipients sent per scheduled chunk
+DEFAULT_CHUNK_SIZE = 100
+
+# Chunks of different campaigns that may run at the same time
+DEFAULT_WORKERS = 4
+
+# Seconds to wait before retrying a chunk whose predecessor is still
+# sending in another process
+CLAIM_RETRY_SECONDS = 5
+
+# Seconds after which a chunk that is still running is assumed to have lost
+# its sender (e.g. a recycled worker) and may be taken over
+DEFAULT_CLAIM_TIMEOUT = 600
+
+
+def next_send_time(moment: datetime, window_start: Optional[dt_time], window_end: Optional[dt_time]) -> datetime:
+    """Return the earliest time at or after `moment` that falls in the daily send window.
+
+    Windows may wrap past midnight (e.g. 22:00-06:00). Without a window,
+    `moment` is returned unchanged.
+    """
+    if window_start is None or window_end is None:
+        return moment
+
+    current = moment.time()
+    if window_start <= window_end:
+        if current < window_start:
+            return datetime.combine(moment.date(), window_start)
+        if current >= window_end:
+            return datetime.combine(moment.date() + timedelta(days=1), window_start)
+        return moment
+
+    # Overnight window
+    if current >= window_start or current < window_end:
+        return moment
+    return datetime.combine(moment.date(), window_start)
+
+
+def window_end_after(start: datetime, window_start: Optional[dt_time], window_end: Optional[dt_time]) -> Optional[datetime]:
+    """Return when the send window that `start` falls in closes"""
+    if window_start is None or window_end is None:
+        return None
+    end = datetime.combine(start.date(), window_end)
+    if end <= start:
+        end += timedelta(days=1)
+    return end
+
+
+def plan_chunks(total_recipients: int, start: datetime, window_start: Optional[dt_time],
+                window_end: Optional[dt_time], chunk_size: Optional[int] = None) -> Tuple[int, float]:
+    """Split a campaign into chunks spread evenly over its first send window.
+
+    Returns (total_chunks, seconds between chunk starts). Without a window
+    chunks run back to back.
+    """
+    if chunk_size is None:
+        chunk_size = int(os.environ.get("SCHEDULE_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+    total_chunks = max(1, (total_recipients + chunk_size - 1) // chunk_size)
+
+    end = window_end_after(start, window_start, window_end)
+    if end is None:
+        return total_chunks, 0.0
+    return total_chunks, (end - start).total_seconds() / total_chunks
+
+
+class CampaignScheduler:
+    """Runs scheduled campaign chunks when they fall due.
+
+    Due times are kept in an in-memory heap and a single thread sleeps on a
+    condition until the earliest one, so thousands of queued campaigns cost
+    nothing while idle and the database is only read at startup. Chunks are
+    claimed in the database before they run, and a campaign is `running`
+    only while one of its chunks is sending, so several processes running a
+    scheduler never send the same chunk twice or two chunks at once. A chunk
+    still running after SCHEDULE_CLAIM_TIMEOUT seconds is taken over and its
+    pending records are sent.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, int]] = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        """Load pending campaigns from the database and start the scheduler thread"""
+        if self._thread is not None:
+            return
+
+        from app import app, ScheduledCampaign, ScheduleStatus
+
+        with app.app_context():
+            pending = ScheduledCampaign.query.filter(
+                ScheduledCampaign.status.in_([ScheduleStatus.SCHEDULED.value, ScheduleStatus.RUNNING.value])
+            ).all()
+            for scheduled in pending:
+                self.schedule(scheduled.id, scheduled.next_chunk_at())
+        logging.info(f"Campaign scheduler started with {len(pending)} pending campaigns")
+
+        workers = int(os.environ.get("SCHEDULER_WORKERS", DEFAULT_WORKERS))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="campaign-chunk")
+        self._thread = threading.Thread(target=self._run, daemon=True, name="campaign-scheduler")
+        self._thread.start()
+
+    def schedule(self, scheduled_id: int, run_at: datetime) -> None:
+        """Queue the next chunk of a scheduled campaign"""
+        with self._condition:
+            self._sequence += 1
+            heapq.heappush(self._heap, (run_at, self._sequence, scheduled_id))
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                run_at, _, scheduled_id = self._heap[0]
+                delay = (run_at - datetime.utcnow()).total_seconds()
+                if delay > 0:
+                    # Woken early by schedule() if an earlier entry arrives
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+
+            # A campaign's next chunk is only queued once this one finishes,
+            # so chunks of one campaign never overlap
+            self._executor.submit(self._run_and_reschedule, scheduled_id)
+
+    def _run_and_reschedule(self, scheduled_id: int) -> None:
+        try:
+            next_run = self._run_chunk(scheduled_id)
+        except Exception as e:
+            logging.error(f"Error running scheduled campaign {scheduled_id}: {str(e)}")
+            return
+        if next_run is not None:
+            self.schedule(scheduled_id, next_run)
+
+    def _run_chunk(self, scheduled_id: int) -> Optional[datetime]:
+        """Send the next chunk of a scheduled campaign; return when the following one is due"""
+        from app import app, db, get_sms_service, complete_campaign, SMSCampaign, SMSStatus, ScheduledCampaign, ScheduleStatus
+
+        with app.app_context():
+            scheduled = db.session.get(ScheduledCampaign, scheduled_id)
+            if scheduled is None or scheduled.status not in (ScheduleStatus.SCHEDULED.value, ScheduleStatus.RUNNING.value):
+                return None
+
+            now = datetime.utcnow()
+            takeover = scheduled.status == ScheduleStatus.RUNNING.value
+            if takeover:
+                # The previous chunk is still sending, possibly in another
+                # process; take it over once its claim has gone stale
+                timeout = int(os.environ.get("SCHEDULE_CLAIM_TIMEOUT", DEFAULT_CLAIM_TIMEOUT))
+                stale_at = scheduled.claimed_at + timedelta(seconds=timeout)
+                if stale_at > now:
+                    return stale_at
+                chunk = scheduled.chunks_done - 1
+                claim = ScheduledCampaign.claimed_at == scheduled.claimed_at
+                update = {'claimed_at': now}
+            else:
+                # The chunk may have come due outside the window after a slow predecessor
+                due = scheduled.next_chunk_at()
+                if due > datetime.utcnow():
+                    return due
+                chunk = scheduled.chunks_done
+                claim = ScheduledCampaign.status == ScheduleStatus.SCHEDULED.value
+                update = {
+                    'chunks_done': chunk + 1,
+                    'status': ScheduleStatus.RUNNING.value,
+                    'claimed_at': now
+                }
+
+            # Claim the chunk; another process may have taken it already
+            claimed = ScheduledCampaign.query.filter(
+                ScheduledCampaign.id == scheduled_id,
+                ScheduledCampaign.chunks_done == scheduled.chunks_done,
+                ScheduledCampaign.status == scheduled.status,
+                claim
+            ).update(update, synchronize_session=False)
+            db.session.commit()
+            if not claimed:
+                # Whoever claimed it queues the following chunk when done;
+                # check back in case that process goes away
+                return datetime.utcnow() + timedelta(seconds=CLAIM_RETRY_SECONDS)
+            db.session.refresh(scheduled)
+            claimed_at = scheduled.claimed_at
+
+            campaign = db.session.get(SMSCampaign, scheduled.campaign_id)
+            offset = chunk * scheduled.chunk_size
+            logging.info(f"Running chunk {chunk + 1}/{scheduled.total_chunks} of scheduled campaign {scheduled_id}")
+
+            try:
+                results = None
+                if takeover:
+                    # Earlier chunks stored exactly `offset` records; if the
+                    # dead sender stored this chunk's, only its pending ones
+                    # are sent, otherwise the chunk is sent from scratch
+                    logging.warning(f"Taking over stale chunk {chunk + 1} of scheduled campaign {scheduled_id}")
+                    results = get_sms_service().resume_bulk_sms(scheduled.message, campaign.id, offset)
+                if results is not None:
+                    messages_sent = results['successful'] + results['failed'] + results['suppressed']
+                elif scheduled.contact_list_id is not None:
+                    results = get_sms_service().send_bulk_sms_to_contact_list(
+                        scheduled.message, scheduled.contact_list_id, campaign.id,
+                        offset=offset, limit=scheduled.chunk_size
+                    )
+                    messages_sent = results['successful'] + results['failed'] + results['suppressed']
+                else:
+                    phone_numbers = scheduled.phone_numbers.split('\n')[offset:offset + scheduled.chunk_size]
+                    results = get_sms_service().send_bulk_sms_with_database(scheduled.message, phone_numbers, campaign.id)
+                    messages_sent = len(phone_numbers)
+
+                final = scheduled.chunks_done >= scheduled.total_chunks
+                complete_campaign(campaign, results, messages_sent, final=final)
+                # Release the campaign for its next chunk, unless it was
+                # cancelled or taken over meanwhile
+                ScheduledCampaign.query.filter(
+                    ScheduledCampaign.id == scheduled_id,
+                    ScheduledCampaign.status == ScheduleStatus.RUNNING.value,
+                    ScheduledCampaign.claimed_at == claimed_at
+                ).update({
+                    'status': ScheduleStatus.COMPLETED.value if final else ScheduleStatus.SCHEDULED.value
+                }, synchronize_session=False)
+                db.session.commit()
+                db.session.refresh(scheduled)
+            except Exception as e:
+                db.session.rollback()
+                scheduled.status = ScheduleStatus.FAILED.value
+                scheduled.error_message = str(e)
+                scheduled.campaign.status = SMSStatus.FAILED
+                scheduled.campaign.completed_at = datetime.utcnow()
+                db.session.commit()
+                raise
+
+            return None if final else scheduled.next_chunk_at()
+
+
+# Shared per-process scheduler
+campaign_scheduler = CampaignScheduler()
@@ -1,14 +1,29 @@
 import os
 import logging
-import africastalking
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
 import time
-import urllib3
-import requests
 import json
+from contextlib import closing
+from dispatcher import NetworkDispatcher
+from logging_config import SampledLog, ProgressLog
 
-# Disable SSL verification warnings - FOR TESTING ONLY
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# The Africa's Talking SDK and requests are imported when first needed, so
+# importing this module (and starting a worker) stays fast
+
+# Rate-limited logs for per-message events on the send hot path
+message_log = SampledLog()
+error_log = SampledLog()
+
+# Africa's Talking messaging endpoint; AFRICAS_TALKING_API_URL points sends
+# elsewhere, e.g. at the load test's stub provider
+DEFAULT_API_URL = "https://api.sandbox.africastalking.com/version1/messaging"
+
+# Seconds a simulated send takes
+SIMULATED_SEND_DELAY = 0.05
+
+# Personalized recipients rendered, stored and sent per round, so large
+# uploads are streamed rather than held in memory
+PERSONALIZED_CHUNK_SIZE = 1000
 
 class SMSService:
     """Service class for handling SMS operations using Africa's Talking API"""
@@ -17,6 +32,7 @@ class SMSService:
         """Initialize the SMS service with Africa's Talking credentials"""
         self.username = os.getenv('AFRICAS_TALKING_USERNAME', 'sandbox')
         self.api_key = os.getenv('AFRICAS_TALKING_API_KEY', 'your-api-key-here')
+        self.api_url = os.getenv('AFRICAS_TALKING_API_URL', DEFAULT_API_URL)
         
         # Check if API key is configured
         self.api_key_configured = self.api_key != 'your-api-key-here' and self.api_key != 'your_api_key'
@@ -27,6 +43,12 @@ class SMSService:
             self.sms = None
         else:
             try:
+                import africastalking
+                import urllib3
+                
+                # Disable SSL verification warnings - FOR TESTING ONLY
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+                
                 # Configure the Africa's Talking SDK to disable SSL verification
                 # WARNING: This is for testing purposes only and should not be used in production
                 africastalking.initialize(self.username, self.api_key)
@@ -46,46 +68,48 @@ class SMSService:
         self.is_sandbox = self.username == 'sandbox' or self.username == 'your_username'
         if self.is_sandbox and self.api_key_configured:
             logging.warning("Running in SANDBOX mode. No real SMS messages will be delivered.")
+        
+        # Per-network queues and rate limits for bulk sends, on threads or
+        # on an asyncio event loop (SMS_DISPATCH_MODE=async)
+        self.async_dispatch = os.getenv('SMS_DISPATCH_MODE', 'threads').lower() == 'async'
+        if self.async_dispatch:
+            from async_dispatch import AsyncNetworkDispatcher
+            self.dispatcher = AsyncNetworkDispatcher(self)
+        else:
+            self.dispatcher = NetworkDispatcher()
     
     def send_single_sms(self, message: str, phone_number: str) -> Dict[str, Any]:
         """Send SMS to a single phone number"""
+        return self.send_batch_sms(message, [phone_number])[0]
+    
+    def send_batch_sms(self, message: str, phone_numbers: List[str]) -> List[Dict[str, Any]]:
+        """Send the same SMS to phone numbers in one provider request; returns one result per number"""
         try:
             # If API is not configured, simulate a successful response
             if not self.api_key_configured or not self.sms:
-                # Generate a fake message ID
                 import uuid
-                fake_message_id = str(uuid.uuid4())
-                
-                logging.info(f"SIMULATED SMS to {phone_number}, message_id: {fake_message_id}")
-                return {
-                    'success': True,
-                    'phone_number': phone_number,
-                    'message_id': fake_message_id,
-                    'cost': '0.5'  # Simulate a cost
-                }
+                results = []
+                for phone_number in phone_numbers:
+                    # Generate a fake message ID
+                    fake_message_id = str(uuid.uuid4())
+                    message_log.info("SIMULATED SMS to %s, message_id: %s", phone_number, fake_message_id)
+                    results.append({
+                        'success': True,
+                        'phone_number': phone_number,
+                        'message_id': fake_message_id,
+                        'cost': '0.5'  # Simulate a cost
+                    })
+                return results
             
             # Try to send using direct requests instead of the SDK
             # This is a fallback for environments with SSL issues
             try:
                 # Direct API call using requests
-                logging.info(f"Sending SMS to {phone_number} using direct API call")
-                
-                # Africa's Talking API endpoint
-                url = "https://api.sandbox.africastalking.com/version1/messaging"
-                
-                # Request headers
-                headers = {
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                    'ApiKey': self.api_key,
-                }
+                import requests
+                recipients = ','.join(phone_numbers)
+                message_log.info("Sending SMS to %s using direct API call", recipients)
                 
-                # Request payload
-                data = {
-                    'username': self.username,
-                    'to': phone_number,
-                    'message': message,
-                }
+                url, headers, data = self._build_send_request(message, recipients)
                 
                 # Make the request with SSL verification disabled
                 response = requests.post(
@@ -96,67 +120,97 @@ class SMSService:
                     timeout=10     # Set a timeout
                 )
                 
-                # Check if the request was successful
-                if response.status_code == 201 or response.status_code == 200:
-                    # Parse the response
-                    response_data = response.json()
-                    
-                    if 'SMSMessageData' in response_data:
-                        recipients = response_data['SMSMessageData'].get('Recipients', [])
-                        if recipients and len(recipients) > 0:
-                            recipient = recipients[0]
-                            status = recipient.get('status')
-                            
-                            if status == 'Success':
-                                return {
-                                    'success': True,
-                                    'phone_number': phone_number,
-                                    'message_id': recipient.get('messageId'),
-                                    'cost': recipient.get('cost')
-                                }
-                    
-                    # If we got here, the response format was unexpected
-                    logging.warning(f"Unexpected response format: {response_data}")
-                else:
-                    # Request failed
-                    logging.error(f"API request failed with status code {response.status_code}: {response.text}")
-                
-                # If we reach here, something went wrong with the direct API call
-                # Fall back to simulating the SMS for testing
-                logging.warning("Direct API call failed, simulating SMS for testing")
-                import uuid
-                fake_message_id = str(uuid.uuid4())
-                
-                return {
-                    'success': True,
-                    'phone_number': phone_number,
-                    'message_id': fake_message_id,
-                    'cost': '0.5',  # Simulate a cost
-                    'simulated': True
-                }
+                response_data = response.json() if response.status_code in (200, 201) else None
+                return self._parse_batch_response(phone_numbers, response.status_code, response_data, response.text)
                 
             except Exception as api_error:
-                logging.error(f"Direct API call error: {str(api_error)}")
+                error_log.error("Direct API call error: %s", api_error)
                 # Fall back to simulating the SMS for testing
-                logging.warning("API call failed, simulating SMS for testing")
-                import uuid
-                fake_message_id = str(uuid.uuid4())
-                
-                return {
-                    'success': True,
-                    'phone_number': phone_number,
-                    'message_id': fake_message_id,
-                    'cost': '0.5',  # Simulate a cost
-                    'simulated': True
-                }
+                error_log.warning("API call failed, simulating SMS for testing")
+                return [self._simulated_fallback(phone_number) for phone_number in phone_numbers]
             
         except Exception as e:
-            logging.error(f"Error sending SMS to {phone_number}: {str(e)}")
-            return {
+            error_log.error("Error sending SMS to %s: %s", ','.join(phone_numbers), e)
+            return [{
                 'success': False,
                 'error': str(e),
                 'phone_number': phone_number
-            }
+            } for phone_number in phone_numbers]
+    
+    def _build_send_request(self, message: str, phone_number: str):
+        """Return the (url, headers, form data) of a provider send request"""
+        # Africa's Talking API endpoint
+        url = self.api_url
+        
+        # Request headers
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'ApiKey': self.api_key,
+        }
+        
+        # Request payload
+        data = {
+            'username': self.username,
+            'to': phone_number,
+            'message': message,
+        }
+        return url, headers, data
+    
+    def _parse_send_response(self, phone_number: str, status_code: int, response_data: Any, response_text: str) -> Dict[str, Any]:
+        """Turn a single-recipient provider response into a send result"""
+        return self._parse_batch_response([phone_number], status_code, response_data, response_text)[0]
+    
+    def _parse_batch_response(self, phone_numbers: List[str], status_code: int, response_data: Any,
+                              response_text: str) -> List[Dict[str, Any]]:
+        """Turn a provider response into one send result per phone number"""
+        # Check if the request was successful
+        if status_code == 201 or status_code == 200:
+            if 'SMSMessageData' in response_data:
+                recipients = response_data['SMSMessageData'].get('Recipients', [])
+                if len(phone_numbers) == 1:
+                    by_number = {phone_numbers[0]: recipients[0]} if recipients else {}
+                else:
+                    by_number = {recipient.get('number'): recipient for recipient in recipients}
+                
+                results = []
+                for phone_number in phone_numbers:
+                    recipient = by_number.get(phone_number)
+                    if recipient and recipient.get('status') == 'Success':
+                        results.append({
+                            'success': True,
+                            'phone_number': phone_number,
+                            'message_id': recipient.get('messageId'),
+                            'cost': recipient.get('cost')
+                        })
+                    else:
+                        # Unexpected recipient entry; fall back to simulating the SMS for testing
+                        error_log.warning("Unexpected response for %s: %s", phone_number, recipient)
+                        results.append(self._simulated_fallback(phone_number))
+                return results
+            
+            # If we got here, the response format was unexpected
+            error_log.warning("Unexpected response format: %s", response_data)
+        else:
+            # Request failed
+            error_log.error("API request failed with status code %s: %s", status_code, response_text)
+        
+        # If we reach here, something went wrong with the direct API call
+        # Fall back to simulating the SMS for testing
+        error_log.warning("Direct API call failed, simulating SMS for testing")
+        return [self._simulated_fallback(phone_number) for phone_number in phone_numbers]
+    
+    def _simulated_fallback(self, phone_number: str) -> Dict[str, Any]:
+        import uuid
+        fake_message_id = str(uuid.uuid4())
+        
+        return {
+            'success': True,
+            'phone_number': phone_number,
+            'message_id': fake_message_id,
+            'cost': '0.5',  # Simulate a cost
+            'simulated': True
+        }
     
     def send_bulk_sms(self, message: str, phone_numbers: List[str]) -> Dict[str, Any]:
         """Send SMS to multiple phone numbers with progress tracking"""
@@ -251,108 +305,312 @@ class SMSService:
     
     def send_bulk_sms_with_database(self, message: str, phone_numbers: List[str], campaign_id: int) -> Dict[str, Any]:
         """Send SMS to multiple phone numbers with database logging"""
+        logging.info(f"Starting bulk SMS send to {len(phone_numbers)} numbers for campaign {campaign_id}")
+        
+        db, SMSRecord, SMSStatus = self._get_db_models()
+        
+        # Create pending SMS records up front
+        sms_records = []
+        for phone_number in phone_numbers:
+            sms_record = SMSRecord()
+            sms_record.campaign_id = campaign_id
+            sms_record.phone_number = phone_number
+            sms_record.status = SMSStatus.PENDING
+            sms_records.append(sms_record)
+        db.session.add_all(sms_records)
+        db.session.flush()  # Get the record IDs
+        
+        return self._send_records(message, sms_records)
+    
+    def send_bulk_sms_to_contact_list(self, message: str, contact_list_id: int, campaign_id: int,
+                                      offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Send SMS to the numbers of a stored contact list with database logging.
+
+        `offset` and `limit` select a slice of the list (in import order), so
+        large lists can be sent in chunks.
+        """
         from datetime import datetime
-        import random
-        import uuid
+        from sqlalchemy import func, insert, select, literal
+        from app import Contact
         
-        results = {
-            'successful': 0,
-            'failed': 0,
-            'details': [],
-            'total_cost': 0.0
-        }
+        db, SMSRecord, SMSStatus = self._get_db_models()
         
-        logging.info(f"Starting bulk SMS send to {len(phone_numbers)} numbers for campaign {campaign_id}")
+        # Only the rows inserted below are sent: earlier chunks' records of
+        # this campaign may still be pending
+        max_id = db.session.query(func.max(SMSRecord.id)).scalar() or 0
         
-        # Import here to avoid circular imports - using a function to delay import until needed
-        def get_db_models():
-            from app import db, SMSRecord, SMSStatus
-            return db, SMSRecord, SMSStatus.value if hasattr(SMSStatus, 'value') else SMSStatus
+        # Generate the pending recipient rows with a single INSERT ... SELECT
+        # instead of a Python round-trip per number
+        recipients = select(
+            literal(campaign_id),
+            Contact.phone_number,
+            literal(SMSStatus.PENDING.value),
+            literal(datetime.utcnow())
+        ).where(Contact.contact_list_id == contact_list_id).order_by(Contact.id).offset(offset).limit(limit)
+        db.session.execute(
+            insert(SMSRecord).from_select(
+                ['campaign_id', 'phone_number', 'status', 'created_at'], recipients
+            )
+        )
         
-        db, SMSRecord, SMSStatus = get_db_models()
+        sms_records = SMSRecord.query.filter(
+            SMSRecord.campaign_id == campaign_id,
+            SMSRecord.id > max_id
+        ).order_by(SMSRecord.id).all()
         
-        # If API is not configured, simulate sending with a delay
-        if not self.api_key_configured or self.sms is None:
-            logging.info(f"SIMULATING bulk SMS with database for {len(phone_numbers)} recipients")
+        logging.info(f"Starting bulk SMS send to {len(sms_records)} numbers of contact list {contact_list_id} for campaign {campaign_id}")
+        return self._send_records(message, sms_records)
+    
+    def resume_bulk_sms(self, message: str, campaign_id: int, offset: int) -> Optional[Dict[str, Any]]:
+        """Finish sending a campaign's records from the `offset`-th on, e.g. a chunk whose sender died.
+
+        Only records still pending are sent, but the results also count the
+        ones sent before. Returns None if there are no such records.
+        """
+        db, SMSRecord, SMSStatus = self._get_db_models()
+        
+        sms_records = SMSRecord.query.filter_by(campaign_id=campaign_id).order_by(SMSRecord.id).offset(offset).all()
+        if not sms_records:
+            return None
+        
+        results = self._new_results()
+        pending = []
+        for sms_record in sms_records:
+            if sms_record.status == SMSStatus.PENDING:
+                pending.append(sms_record)
+            elif sms_record.status == SMSStatus.SUCCESS:
+                results['successful'] += 1
+                results['total_cost'] += sms_record.cost or 0.0
+            elif sms_record.status == SMSStatus.SUPPRESSED:
+                results['suppressed'] += 1
+            else:
+                results['failed'] += 1
+        
+        logging.info(f"Resuming campaign {campaign_id}: {len(pending)} of {len(sms_records)} records still pending")
+        return self._send_records(message, pending, results=results)
+    
+    def send_bulk_sms_personalized(self, recipients: Iterable[Tuple[str, str]], campaign_id: int) -> Dict[str, Any]:
+        """Send a personalized text to each recipient with database logging.
+
+        `recipients` yields (phone_number, rendered text) and is consumed in
+        chunks of PERSONALIZED_CHUNK_SIZE. Within a chunk, recipients whose
+        text is identical share provider requests. Per-recipient details are
+        not returned, so memory stays flat however large the upload; they
+        are kept on the campaign's SMS records.
+        """
+        from itertools import islice
+        
+        db, SMSRecord, SMSStatus = self._get_db_models()
+        
+        results = self._new_results()
+        recipients = iter(recipients)
+        total = 0
+        while True:
+            chunk = list(islice(recipients, PERSONALIZED_CHUNK_SIZE))
+            if not chunk:
+                break
             
-            for i, phone_number in enumerate(phone_numbers):
-                # Simulate processing delay
-                time.sleep(0.05)
-                
-                # Generate a fake message ID
-                fake_message_id = str(uuid.uuid4())
-                
-                # Create SMS record
+            sms_records = []
+            for phone_number, _ in chunk:
                 sms_record = SMSRecord()
                 sms_record.campaign_id = campaign_id
                 sms_record.phone_number = phone_number
                 sms_record.status = SMSStatus.PENDING
-                db.session.add(sms_record)
-                db.session.flush()  # Get the record ID
-                
-                # Simulate a success rate of about 95%
-                is_successful = random.random() < 0.95
-                
-                # Simulate cost between 0.4 and 0.6
-                cost = round(random.uniform(0.4, 0.6), 2) if is_successful else 0.0
-                
-                # Update the record based on simulated result
-                if is_successful:
-                    sms_record.status = SMSStatus.SUCCESS
-                    sms_record.message_id = fake_message_id
-                    sms_record.cost = cost
-                    sms_record.sent_at = datetime.utcnow()
-                    
-                    results['successful'] += 1
-                    results['total_cost'] += cost
-                    
-                    error_message = None
-                else:
-                    sms_record.status = SMSStatus.FAILED
-                    error_message = random.choice(["Network error", "Invalid number", "Delivery failed"])
-                    sms_record.error_message = error_message
-                    
-                    results['failed'] += 1
-                
-                # Add details to results
-                results['details'].append({
-                    'success': is_successful,
-                    'phone_number': phone_number,
-                    'message_id': fake_message_id if is_successful else None,
-                    'cost': str(cost),
-                    'error': error_message
-                })
-                
-                # Log progress every 10 messages
-                if (i + 1) % 10 == 0:
-                    logging.info(f"Processed {i + 1}/{len(phone_numbers)} simulated messages")
-                    db.session.commit()  # Commit progress periodically
+                sms_records.append(sms_record)
+            db.session.add_all(sms_records)
+            db.session.flush()  # Get the record IDs
             
-            # Final commit
-            db.session.commit()
-            logging.info(f"Bulk SMS simulation with database completed. Success: {results['successful']}, Failed: {results['failed']}")
-            return results
+            results = self._send_records(None, sms_records, messages=[text for _, text in chunk], results=results)
+            results['details'].clear()
+            total += len(chunk)
         
-        for i, phone_number in enumerate(phone_numbers):
-            # Create SMS record
-            sms_record = SMSRecord()
-            sms_record.campaign_id = campaign_id
-            sms_record.phone_number = phone_number
-            sms_record.status = SMSStatus.PENDING
-            db.session.add(sms_record)
-            db.session.flush()  # Get the record ID
-            
+        logging.info(f"Personalized SMS send to {total} recipients completed for campaign {campaign_id}")
+        del results['details']
+        return results
+    
+    def send_transactional_sms(self, message: str, phone_number: str) -> Dict[str, Any]:
+        """Send one transactional message (OTP, alert) through the priority lane.
+
+        Skips campaign validation and statistics bookkeeping, but still writes
+        an SMSRecord against the day's transactional campaign.
+        """
+        from datetime import datetime
+        from app import get_transactional_campaign_id, SMSCampaign
+        
+        db, SMSRecord, SMSStatus = self._get_db_models()
+        started = time.perf_counter()
+        
+        simulated = not self.api_key_configured or self.sms is None
+        send = self._simulate_single_sms if simulated else self.send_single_sms
+        network, result = self.dispatcher.send_priority(message, phone_number, send)
+        
+        campaign_id = get_transactional_campaign_id()
+        sms_record = SMSRecord()
+        sms_record.campaign_id = campaign_id
+        sms_record.phone_number = phone_number
+        
+        if result['success']:
+            sms_record.status = SMSStatus.SUCCESS
+            sms_record.message_id = result.get('message_id')
+            sms_record.sent_at = datetime.utcnow()
             try:
-                # Send SMS
-                result = self.send_single_sms(message, phone_number)
+                sms_record.cost = float(result.get('cost', '0').replace('KES', '').replace('USD', '').strip())
+            except (ValueError, AttributeError):
+                sms_record.cost = 0.0
+            counters = {
+                SMSCampaign.successful_sends: SMSCampaign.successful_sends + 1,
+                SMSCampaign.total_cost: SMSCampaign.total_cost + sms_record.cost
+            }
+        else:
+            sms_record.status = SMSStatus.FAILED
+            sms_record.error_message = result.get('error') or 'Unknown error'
+            counters = {SMSCampaign.failed_sends: SMSCampaign.failed_sends + 1}
+        counters[SMSCampaign.total_recipients] = SMSCampaign.total_recipients + 1
+        
+        db.session.add(sms_record)
+        # Atomic in-database increments keep concurrent senders from racing
+        SMSCampaign.query.filter_by(id=campaign_id).update(counters, synchronize_session=False)
+        db.session.commit()
+        
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.dispatcher.priority_latency.record(latency_ms)
+        
+        return {
+            **result,
+            'record_id': sms_record.id,
+            'network': network,
+            'latency_ms': round(latency_ms, 2)
+        }
+    
+    @staticmethod
+    def _get_db_models():
+        # Import here to avoid circular imports - delay import until needed
+        from app import db, SMSRecord, SMSStatus
+        return db, SMSRecord, SMSStatus
+    
+    def _apply_suppression(self, sms_records: List[Any], results: Dict[str, Any]) -> Set[str]:
+        """Mark opted-out recipients as suppressed and return their phone numbers"""
+        from suppression import suppression_list
+        
+        db, SMSRecord, SMSStatus = self._get_db_models()
+        
+        suppressed_numbers = suppression_list.check_many(record.phone_number for record in sms_records)
+        if not suppressed_numbers:
+            return suppressed_numbers
+        
+        reasons = suppression_list.get_reasons(suppressed_numbers)
+        suppressed_count = 0
+        for sms_record in sms_records:
+            if sms_record.phone_number not in suppressed_numbers:
+                continue
+            suppressed_count += 1
+            
+            reason = f"Suppressed: {reasons.get(sms_record.phone_number) or 'Opted out'}"
+            sms_record.status = SMSStatus.SUPPRESSED
+            sms_record.error_message = reason
+            results['suppressed'] += 1
+            results['details'].append({
+                'success': False,
+                'suppressed': True,
+                'error': reason,
+                'phone_number': sms_record.phone_number
+            })
+        
+        logging.info(f"Suppressed {suppressed_count} of {len(sms_records)} recipients")
+        return suppressed_numbers
+    
+    def _simulate_single_sms(self, message: str, phone_number: str) -> Dict[str, Any]:
+        """Simulate a provider send with a small delay and a ~95% success rate"""
+        return self._simulate_batch_sms(message, [phone_number])[0]
+    
+    def _simulate_batch_sms(self, message: str, phone_numbers: List[str]) -> List[Dict[str, Any]]:
+        """Simulate one provider request to several phone numbers"""
+        # Simulate processing delay
+        time.sleep(SIMULATED_SEND_DELAY)
+        return [self._simulated_result(phone_number) for phone_number in phone_numbers]
+    
+    @staticmethod
+    def _simulated_result(phone_number: str) -> Dict[str, Any]:
+        import random
+        import uuid
+        
+        is_successful = random.random() < 0.95
+        return {
+            'success': is_successful,
+            'phone_number': phone_number,
+            'message_id': str(uuid.uuid4()) if is_successful else None,
+            # Simulate cost between 0.4 and 0.6
+            'cost': str(round(random.uniform(0.4, 0.6), 2)) if is_successful else '0.0',
+            'error': None if is_successful else random.choice(["Network error", "Invalid number", "Delivery failed"])
+        }
+    
+    @staticmethod
+    def _new_results() -> Dict[str, Any]:
+        return {
+            'successful': 0,
+            'failed': 0,
+            'suppressed': 0,
+            'details': [],
+            'total_cost': 0.0,
+            'networks': {}
+        }
+    
+    def _send_records(self, message: Optional[str], sms_records: List[Any], messages: Optional[List[str]] = None,
+                      results: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Send the message for each pending SMS record and store the outcome on it.
+
+        `messages`, if given, holds a personalized text per record instead of
+        one `message` for all. Records with identical text are batched into
+        shared provider requests. Pass `results` to keep adding to the
+        results of an earlier call.
+        """
+        from datetime import datetime
+        
+        db, SMSRecord, SMSStatus = self._get_db_models()
+        
+        if results is None:
+            results = self._new_results()
+        
+        if messages is None:
+            messages = [message] * len(sms_records)
+        suppressed_numbers = self._apply_suppression(sms_records, results)
+        
+        # Group recipients by text, in the order each text first appears
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        to_send = 0
+        for index, sms_record in enumerate(sms_records):
+            if sms_record.phone_number not in suppressed_numbers:
+                groups.setdefault(messages[index], []).append((index, sms_record.phone_number))
+                to_send += 1
+        
+        # If API is not configured, simulate sending
+        simulated = not self.api_key_configured or self.sms is None
+        if self.async_dispatch:
+            send = self.dispatcher.get_async_sender(simulated)
+        else:
+            send = self._simulate_batch_sms if simulated else self.send_batch_sms
+        if simulated:
+            logging.info("SIMULATING bulk SMS with database for %d recipients, %d distinct texts", to_send, len(groups))
+        
+        # Records are updated here, in the thread that owns the session;
+        # the dispatcher's per-network workers only talk to the provider
+        progress = ProgressLog("Bulk SMS progress", to_send)
+        dispatched = self.dispatcher.dispatch(list(groups.items()), send)
+        # Closing the dispatch on an error (e.g. a failed commit) stops the
+        # workers before they send batches that could no longer be recorded
+        with closing(dispatched):
+            for i, (index, network, result) in enumerate(dispatched):
+                sms_record = sms_records[index]
                 results['details'].append(result)
-                
+                network_results = results['networks'].setdefault(network, {'successful': 0, 'failed': 0})
+            
                 if result['success']:
                     results['successful'] += 1
+                    network_results['successful'] += 1
                     sms_record.status = SMSStatus.SUCCESS
                     sms_record.message_id = result.get('message_id')
                     sms_record.sent_at = datetime.utcnow()
-                    
+                
                     # Extract and store cost
                     cost_str = result.get('cost', '0')
                     try:
@@ -363,33 +621,19 @@ class SMSService:
                         sms_record.cost = 0.0
                 else:
                     results['failed'] += 1
+                    network_results['failed'] += 1
                     sms_record.status = SMSStatus.FAILED
-                    sms_record.error_message = result.get('error', 'Unknown error')
-                
-                # Small delay to avoid rate limiting
-                if i < len(phone_numbers) - 1:
-                    time.sleep(0.1)
-                
-                # Log progress every 10 messages
+                    sms_record.error_message = result.get('error') or 'Unknown error'
+            
+                # Commit every 10 messages; log aggregate progress periodically
                 if (i + 1) % 10 == 0:
-                    logging.info(f"Processed {i + 1}/{len(phone_numbers)} messages")
                     db.session.commit()  # Commit progress periodically
-                    
-            except Exception as e:
-                logging.error(f"Error processing phone number {phone_number}: {str(e)}")
-                results['failed'] += 1
-                sms_record.status = SMSStatus.FAILED
-                sms_record.error_message = str(e)
-                results['details'].append({
-                    'success': False,
-                    'error': str(e),
-                    'phone_number': phone_number
-                })
+                progress.update(i + 1, results['successful'], results['failed'])
         
         # Final commit
         db.session.commit()
         
-        logging.info(f"Bulk SMS completed. Success: {results['successful']}, Failed: {results['failed']}")
+        logging.info("Bulk SMS completed. Success: %d, Failed: %d", results['successful'], results['failed'])
         return results
     
     def get_service_status(self) -> Dict[str, Any]:
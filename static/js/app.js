@@ -9,6 +9,8 @@ class SMSApp {
         this.sendBtn = document.getElementById('sendBtn');
         this.progressSection = document.getElementById('progressSection');
         this.resultsSection = document.getElementById('resultsSection');
+        this.estimateTimer = null;
+        this.estimateRequest = 0;
         
         this.init();
     }
@@ -37,14 +39,13 @@ class SMSApp {
     updateMessageCounter() {
         const message = this.messageInput.value;
         const charCount = message.length;
-        const smsCount = this.calculateSMSParts(message);
         
         // Update character count
         const charCountElement = document.getElementById('charCount');
         charCountElement.textContent = charCount;
         
-        // Update SMS parts count
-        document.getElementById('smsCount').textContent = smsCount;
+        // SMS parts and cost come from the server's estimate
+        this.scheduleEstimate();
         
         // Color coding for character count
         charCountElement.className = '';
@@ -64,6 +65,9 @@ class SMSApp {
         document.getElementById('phoneCount').textContent = totalCount;
         document.getElementById('validCount').textContent = validCount;
         document.getElementById('invalidCount').textContent = invalidCount;
+        
+        // Recipients change the cost estimate
+        this.scheduleEstimate();
     }
     
     updateCounters() {
@@ -98,16 +102,35 @@ class SMSApp {
         return ghanaPattern.test(formattedNumber);
     }
     
-    calculateSMSParts(message) {
-        if (!message) return 0;
-        
-        // Check if message contains non-GSM characters
-        const gsmChars = /^[@£$¥èéùìòÇØøÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !"#¤%&'()*+,\-./0123456789:;<=>?¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà\n\r\t]*$/;
-        
-        const isUnicode = !gsmChars.test(message);
-        const maxCharsPerSMS = isUnicode ? 70 : 160;
+    scheduleEstimate() {
+        // Wait for a pause in typing before asking the server
+        clearTimeout(this.estimateTimer);
+        this.estimateTimer = setTimeout(() => this.updateEstimate(), 300);
+    }
+    
+    async updateEstimate() {
+        const requestId = ++this.estimateRequest;
+        const formData = new FormData();
+        formData.append('message', this.messageInput.value);
+        formData.append('phone_numbers', this.phoneNumbersInput.value);
         
-        return Math.ceil(message.length / maxCharsPerSMS);
+        try {
+            const response = await fetch('/estimate_cost', {
+                method: 'POST',
+                body: formData
+            });
+            const estimate = await response.json();
+            
+            // Ignore responses that arrive after a newer request
+            if (requestId !== this.estimateRequest || !estimate.success) return;
+            
+            document.getElementById('smsCount').textContent = estimate.segments_per_message;
+            document.getElementById('smsEncoding').textContent = estimate.encoding;
+            document.getElementById('estimatedCost').textContent =
+                `${estimate.estimated_cost.toFixed(2)} ${estimate.currency}`;
+        } catch (error) {
+            console.error('Estimate error:', error);
+        }
     }
     
     handleCSVUpload() {
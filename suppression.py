@@ -0,0 +1,331 @@
+import os
+import math
+import logging
+import threading
+import time
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Set
+
+# 64-bit multiplicative hashing constants for the bloom filter
+_MASK64 = (1 << 64) - 1
+_HASH_MULTIPLIER_1 = 0x9E3779B97F4A7C15
+_HASH_MULTIPLIER_2 = 0xC2B2AE3D27D4EB4F
+
+# Recently added numbers are kept in a set and merged into the sorted
+# array once the set grows past this size
+_MERGE_THRESHOLD = 50000
+
+# Rows below the highest id seen that every refresh reads again. Ids are
+# handed out before commit, so a row can become visible after one with a
+# higher id; re-reading is harmless because adding a known key is a no-op
+DEFAULT_REFRESH_MARGIN = 1000
+
+
+def phone_number_key(phone_number: str) -> int:
+    """Convert a +233XXXXXXXXX phone number to a compact integer key"""
+    return int(phone_number.lstrip('+'))
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over integer keys"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """Size the filter for `capacity` keys at the given false positive rate"""
+        capacity = max(capacity, 1000)
+        # Standard sizing: m = -n ln(p) / ln(2)^2 bits, k = m/n ln(2) hashes
+        self.num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2)) + 1
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: int):
+        h1 = (key * _HASH_MULTIPLIER_1) & _MASK64
+        h2 = ((key * _HASH_MULTIPLIER_2) & _MASK64) | 1
+        for i in range(self.num_hashes):
+            yield ((h1 + i * h2) & _MASK64) % self.num_bits
+
+    def add(self, key: int) -> None:
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: int) -> bool:
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+def _in_sorted(sorted_keys: array, key: int) -> bool:
+    index = bisect_left(sorted_keys, key)
+    return index < len(sorted_keys) and sorted_keys[index] == key
+
+
+class SuppressionList:
+    """In-memory index of opted-out phone numbers.
+
+    A bloom filter rejects the common "not suppressed" case without a
+    lookup; hits are confirmed against a sorted array of integer keys (8
+    bytes per number) plus small sets of recently added and removed
+    numbers. The index is loaded from the `suppressed_numbers` table in a
+    background thread, then refreshed incrementally by row id: new rows
+    are added and rows of `suppression_removals` (written whenever numbers
+    are removed) are dropped. Rows committed out of id order are caught by
+    re-reading a trailing margin of ids, and the whole list is reloaded in
+    the background every `resync_interval` seconds as a backstop. Merging
+    the recent changes into the sorted array also happens in the
+    background, so a send never waits on it.
+    """
+
+    def __init__(self, refresh_interval: Optional[float] = None, resync_interval: Optional[float] = None,
+                 refresh_margin: Optional[int] = None):
+        if refresh_interval is None:
+            refresh_interval = float(os.environ.get("SUPPRESSION_REFRESH_SECONDS", "10"))
+        if resync_interval is None:
+            resync_interval = float(os.environ.get("SUPPRESSION_RESYNC_SECONDS", "3600"))
+        if refresh_margin is None:
+            refresh_margin = int(os.environ.get("SUPPRESSION_REFRESH_MARGIN", DEFAULT_REFRESH_MARGIN))
+        self.refresh_interval = refresh_interval
+        self.resync_interval = resync_interval
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._bloom = BloomFilter(0)
+        self._sorted_keys = array('q')
+        self._recent_keys: Set[int] = set()
+        self._removed_keys: Set[int] = set()
+        self._last_id = 0
+        self._last_removal_id = 0
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._last_full_load = 0.0
+        self._loader: Optional[threading.Thread] = None
+        self._loader_pid: Optional[int] = None
+        self._rebuilding = False
+
+    def __len__(self) -> int:
+        return len(self._sorted_keys) + len(self._recent_keys) - len(self._removed_keys)
+
+    def _contains_key(self, key: int) -> bool:
+        # Bloom filter first, so a concurrent swap never causes a false negative
+        if key not in self._bloom or key in self._removed_keys:
+            return False
+        return key in self._recent_keys or _in_sorted(self._sorted_keys, key)
+
+    def start(self) -> None:
+        """Start loading the index in a background thread of this process"""
+        with self._lock:
+            if self._loader is not None and self._loader_pid == os.getpid() and (self._loaded or self._loader.is_alive()):
+                return
+            self._start_loader()
+
+    def _start_loader(self) -> None:
+        # Called with self._lock held
+        self._loader = threading.Thread(target=self._load, daemon=True, name="suppression-loader")
+        self._loader_pid = os.getpid()
+        self._loader.start()
+
+    def _load(self) -> None:
+        from app import app
+
+        try:
+            with app.app_context():
+                self._full_reload()
+        except Exception as e:
+            logging.error(f"Failed to load the suppression list: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def _maybe_resync(self) -> None:
+        """Reload the whole list in the background once `resync_interval` has passed"""
+        if time.monotonic() - self._last_full_load < self.resync_interval:
+            return
+        with self._lock:
+            # A resync replaces the sorted array, so it never overlaps a merge
+            if self._rebuilding or (self._loader is not None and self._loader.is_alive()):
+                return
+            self._rebuilding = True
+            self._start_loader()
+
+    def check_many(self, phone_numbers: Iterable[str]) -> Set[str]:
+        """Return the subset of phone numbers that are suppressed"""
+        if not self._loaded:
+            # Only the first send of a process waits for the initial load
+            self.start()
+            self._loader.join()
+            if not self._loaded:
+                raise RuntimeError("Suppression list could not be loaded; refusing to send")
+        self.refresh()
+        return {number for number in phone_numbers if self._contains_key(phone_number_key(number))}
+
+    def add(self, phone_numbers: Iterable[str]) -> None:
+        """Add numbers to the in-memory index without waiting for a refresh"""
+        with self._lock:
+            self._add_keys(phone_number_key(number) for number in phone_numbers)
+
+    def remove(self, phone_numbers: Iterable[str]) -> None:
+        """Drop numbers from the in-memory index without waiting for a refresh"""
+        with self._lock:
+            self._remove_keys(phone_number_key(number) for number in phone_numbers)
+
+    def _add_keys(self, keys: Iterable[int]) -> None:
+        for key in keys:
+            self._removed_keys.discard(key)
+            if self._contains_key(key):
+                continue
+            self._bloom.add(key)
+            self._recent_keys.add(key)
+        self._maybe_rebuild()
+
+    def _remove_keys(self, keys: Iterable[int]) -> None:
+        for key in keys:
+            self._recent_keys.discard(key)
+            # A rebuild may be merging the recent key into its new array
+            if self._rebuilding or _in_sorted(self._sorted_keys, key):
+                self._removed_keys.add(key)
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self) -> None:
+        # A full filter only costs extra lookups until the rebuild swaps in
+        if self._rebuilding or not self._loaded:
+            return
+        if (len(self) > self._bloom.capacity or len(self._recent_keys) > _MERGE_THRESHOLD
+                or len(self._removed_keys) > _MERGE_THRESHOLD):
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild, daemon=True, name="suppression-rebuild").start()
+
+    def _rebuild(self) -> None:
+        """Merge recent additions and removals into a new sorted array and filter"""
+        try:
+            with self._lock:
+                sorted_keys = self._sorted_keys
+                recent, removed = set(self._recent_keys), set(self._removed_keys)
+            merged = array('q', (key for key in heapq.merge(sorted_keys, sorted(recent)) if key not in removed))
+            self._swap_in(merged)
+        except Exception as e:
+            logging.error(f"Failed to rebuild the suppression list: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def _swap_in(self, sorted_keys: array) -> None:
+        """Replace the index with `sorted_keys`, keeping changes made while it was built"""
+        bloom = BloomFilter(int(len(sorted_keys) * 1.5))
+        for key in sorted_keys:
+            bloom.add(key)
+
+        with self._lock:
+            recent_keys = {key for key in self._recent_keys if not _in_sorted(sorted_keys, key)}
+            removed_keys = {key for key in self._removed_keys if _in_sorted(sorted_keys, key)}
+            for key in recent_keys:
+                bloom.add(key)
+            # Readers check the recent set before the sorted array, so the
+            # array is swapped first: no reader misses a suppressed key
+            self._bloom = bloom
+            self._sorted_keys = sorted_keys
+            self._recent_keys = recent_keys
+            self._removed_keys = removed_keys
+
+    def refresh(self, force: bool = False) -> None:
+        """Apply numbers added and removed since the last refresh.
+
+        Both are read by id from indexed tables, so a refresh costs two
+        small range queries covering the new rows and the trailing margin.
+        A send that finds another thread refreshing goes ahead with the
+        current index.
+        """
+        if not self._loaded:
+            return
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+
+        from app import db, SuppressedNumber, SuppressionRemoval
+
+        try:
+            self._maybe_resync()
+
+            removals = db.session.query(SuppressionRemoval.id, SuppressionRemoval.phone_number).filter(
+                SuppressionRemoval.id > self._last_removal_id - self.refresh_margin
+            ).order_by(SuppressionRemoval.id).all()
+            rows = db.session.query(SuppressedNumber.id, SuppressedNumber.phone_number).filter(
+                SuppressedNumber.id > self._last_id - self.refresh_margin
+            ).order_by(SuppressedNumber.id).all()
+
+            # A removal read again may be older than the number being added
+            # back, so indexed numbers are only dropped if no longer stored
+            candidates = list({number for _, number in removals if self._contains_key(phone_number_key(number))})
+            still_stored = set()
+            for i in range(0, len(candidates), 500):
+                present = db.session.query(SuppressedNumber.phone_number).filter(
+                    SuppressedNumber.phone_number.in_(candidates[i:i + 500])
+                ).all()
+                still_stored.update(row[0] for row in present)
+
+            with self._lock:
+                removed = [phone_number_key(number) for number in candidates if number not in still_stored]
+                added = [key for key in (phone_number_key(number) for _, number in rows) if not self._contains_key(key)]
+                # The stored-numbers check ran last, so it wins over the rows read
+                self._add_keys(added)
+                self._remove_keys(removed)
+                if removals:
+                    self._last_removal_id = max(self._last_removal_id, removals[-1][0])
+                if rows:
+                    self._last_id = max(self._last_id, rows[-1][0])
+            if added or removed:
+                logging.info(f"Suppression list refreshed: {len(added)} added, {len(removed)} removed")
+            self._last_refresh = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def _full_reload(self) -> None:
+        from app import db, SuppressedNumber, SuppressionRemoval
+
+        # Removals recorded before this point are reflected in the rows read below
+        last_removal_id = db.session.query(db.func.max(SuppressionRemoval.id)).scalar() or 0
+
+        # All stored numbers share the +233 prefix and length, so ordering by
+        # the unique phone_number index yields the keys already sorted
+        keys = array('q')
+        last_id = 0
+        query = db.session.query(SuppressedNumber.id, SuppressedNumber.phone_number).order_by(SuppressedNumber.phone_number)
+        for row_id, number in query.yield_per(10000):
+            keys.append(phone_number_key(number))
+            last_id = max(last_id, row_id)
+
+        self._swap_in(keys)
+        self._last_id = max(self._last_id, last_id)
+        self._last_removal_id = max(self._last_removal_id, last_removal_id)
+        self._last_refresh = self._last_full_load = time.monotonic()
+        self._loaded = True
+        logging.info(f"Suppression list loaded: {len(keys)} numbers")
+
+    def get_reasons(self, phone_numbers: Iterable[str]) -> Dict[str, str]:
+        """Look up the stored suppression reason for each number"""
+        from app import db, SuppressedNumber
+
+        phone_numbers = list(phone_numbers)
+        reasons = {}
+        for i in range(0, len(phone_numbers), 500):
+            rows = db.session.query(SuppressedNumber.phone_number, SuppressedNumber.reason).filter(
+                SuppressedNumber.phone_number.in_(phone_numbers[i:i + 500])
+            ).all()
+            reasons.update(rows)
+        return reasons
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            'loaded': self._loaded,
+            'total_numbers': len(self),
+            'bloom_filter_bytes': len(self._bloom.bits),
+            'sorted_array_bytes': self._sorted_keys.itemsize * len(self._sorted_keys),
+            'pending_changes': len(self._recent_keys) + len(self._removed_keys),
+            'refresh_interval': self.refresh_interval
+        }
+
+
+# Shared per-process index
+suppression_list = SuppressionList()
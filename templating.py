@@ -0,0 +1,84 @@
+import csv
+import codecs
+import string
+from typing import IO, Iterator, List, Optional, Sequence, Tuple
+
+# Header names recognised as the phone number column, in order of preference
+PHONE_COLUMN_NAMES = ('phone_number', 'phone', 'mobile', 'msisdn', 'number')
+
+
+class MessageTemplate:
+    """A message with {column} placeholders, compiled once per campaign.
+
+    Placeholder names are matched to CSV columns (case-insensitively) when
+    the template is compiled, so rendering a recipient is a single
+    str.format call over the row. Literal braces are written {{ and }}.
+    """
+
+    def __init__(self, text: str, columns: Sequence[str]):
+        """Compile `text` against the CSV header `columns`; raises ValueError for bad placeholders"""
+        column_index = {name.strip().lower(): i for i, name in enumerate(columns)}
+        parts = []
+        self.fields: List[str] = []
+
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            parts.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field is None:
+                continue
+            name = field.strip().lower()
+            if format_spec or conversion:
+                raise ValueError(f'Invalid placeholder {{{field}}}: use plain {{column}} names without formatting')
+            if name not in column_index:
+                raise ValueError(f'Unknown placeholder {{{field}}}. Placeholders must match a CSV column name')
+            parts.append(f'{{{column_index[name]}}}')
+            self.fields.append(name)
+
+        self.text = text
+        self.column_count = len(columns)
+        self._format = ''.join(parts)
+
+    @property
+    def is_personalized(self) -> bool:
+        return bool(self.fields)
+
+    def render(self, row: Sequence[str]) -> str:
+        """Fill the placeholders from one CSV row"""
+        if len(row) < self.column_count:
+            # Short rows leave their missing columns blank
+            row = list(row) + [''] * (self.column_count - len(row))
+        return self._format.format(*row)
+
+
+class CSVRecipients:
+    """Streams recipient rows from an uploaded CSV file with a header row.
+
+    Rows are decoded and parsed as they are read, so a large upload is never
+    held in memory as a whole. Iterating yields (raw phone number, row).
+    """
+
+    def __init__(self, stream: IO[bytes], phone_column: Optional[str] = None):
+        self.stream = stream
+        header = next(self._reader(), None)
+        if not header:
+            raise ValueError('The CSV file is empty')
+        self.columns = [name.strip() for name in header]
+
+        lowered = [name.lower() for name in self.columns]
+        candidates = (phone_column.strip().lower(),) if phone_column else PHONE_COLUMN_NAMES
+        self.phone_index = next((lowered.index(name) for name in candidates if name in lowered), None)
+        if self.phone_index is None:
+            raise ValueError(
+                f"No phone number column found. Name it one of: {', '.join(PHONE_COLUMN_NAMES)}, or set phone_column"
+            )
+
+    def _reader(self) -> Iterator[List[str]]:
+        self.stream.seek(0)
+        return csv.reader(codecs.iterdecode(self.stream, 'utf-8-sig'))
+
+    def __iter__(self) -> Iterator[Tuple[str, List[str]]]:
+        rows = self._reader()
+        next(rows, None)  # Header
+        phone_index = self.phone_index
+        for row in rows:
+            if len(row) > phone_index and row[phone_index].strip():
+                yield row[phone_index].strip(), [cell.strip() for cell in row]
@@ -0,0 +1,43 @@
+from datetime import datetime, time
+
+from scheduler import next_send_time, plan_chunks, window_end_after
+
+DAY = (time(8, 0), time(17, 0))
+OVERNIGHT = (time(22, 0), time(6, 0))
+
+
+def at(hour, minute=0, day=1):
+    return datetime(2025, 1, day, hour, minute)
+
+
+def test_no_window_sends_immediately():
+    assert next_send_time(at(3), None, None) == at(3)
+
+
+def test_day_window():
+    assert next_send_time(at(7), *DAY) == at(8)
+    assert next_send_time(at(12), *DAY) == at(12)
+    assert next_send_time(at(17), *DAY) == at(8, day=2)
+
+
+def test_overnight_window():
+    assert next_send_time(at(23), *OVERNIGHT) == at(23)
+    assert next_send_time(at(3), *OVERNIGHT) == at(3)
+    assert next_send_time(at(6), *OVERNIGHT) == at(22)
+    assert next_send_time(at(12), *OVERNIGHT) == at(22)
+
+
+def test_overnight_window_end():
+    assert window_end_after(at(23), *OVERNIGHT) == at(6, day=2)
+    assert window_end_after(at(3), *OVERNIGHT) == at(6)
+
+
+def test_plan_chunks_spreads_over_window():
+    total_chunks, interval = plan_chunks(250, at(22), *OVERNIGHT, chunk_size=100)
+    assert total_chunks == 3
+    assert interval == 8 * 3600 / 3
+
+
+def test_plan_chunks_without_window():
+    assert plan_chunks(100, at(12), None, None, chunk_size=100) == (1, 0.0)
+    assert plan_chunks(0, at(12), None, None, chunk_size=100) == (1, 0.0)
@@ -0,0 +1,77 @@
+import time
+from array import array
+
+from suppression import BloomFilter, SuppressionList, phone_number_key
+
+
+def make_list(numbers=()):
+    """A loaded index that never refreshes from the database"""
+    suppression = SuppressionList(refresh_interval=float('inf'), resync_interval=float('inf'))
+    suppression._swap_in(array('q', sorted(phone_number_key(number) for number in numbers)))
+    suppression._loaded = True
+    return suppression
+
+
+def numbers(start, count):
+    return [f'+233240{i:06d}' for i in range(start, start + count)]
+
+
+def wait_for_rebuild(suppression):
+    deadline = time.monotonic() + 10
+    while suppression._rebuilding and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not suppression._rebuilding
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    keys = [phone_number_key(number) for number in numbers(0, 1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_loaded_numbers_are_suppressed():
+    suppression = make_list(numbers(0, 10))
+    assert suppression.check_many(numbers(5, 10)) == set(numbers(5, 5))
+    assert len(suppression) == 10
+
+
+def test_add_and_remove():
+    suppression = make_list(numbers(0, 10))
+    suppression.add(['+233550000001'])
+    suppression.remove([numbers(0, 1)[0]])
+    assert suppression.check_many(['+233550000001', numbers(0, 1)[0]]) == {'+233550000001'}
+
+    suppression.add([numbers(0, 1)[0]])
+    suppression.remove(['+233550000001'])
+    assert suppression.check_many(['+233550000001', numbers(0, 1)[0]]) == {numbers(0, 1)[0]}
+    assert len(suppression) == 10
+
+
+def test_rebuild_keeps_lookups_consistent():
+    suppression = make_list(numbers(0, 500))
+    # Growing past the filter's capacity starts a background rebuild
+    suppression.add(numbers(500, 2000))
+    suppression.remove(numbers(0, 100) + numbers(2400, 100))
+    wait_for_rebuild(suppression)
+    suppression._rebuild()
+
+    kept = numbers(100, 2300)
+    removed = numbers(0, 100) + numbers(2400, 100)
+    assert suppression.check_many(kept + removed + numbers(5000, 100)) == set(kept)
+    assert len(suppression) == len(kept)
+    assert suppression.get_status()['pending_changes'] == 0
+    assert suppression._bloom.capacity >= len(kept)
+
+
+def test_swap_keeps_changes_made_during_rebuild():
+    suppression = make_list(numbers(0, 10))
+    snapshot = array('q', suppression._sorted_keys)
+    # Changes made while a rebuild was working from the old snapshot
+    suppression.add(['+233550000001'])
+    suppression.remove([numbers(0, 1)[0]])
+    suppression._swap_in(snapshot)
+
+    assert suppression.check_many(['+233550000001', numbers(0, 1)[0]]) == {'+233550000001'}
+    assert len(suppression) == 10
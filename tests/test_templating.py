@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from templating import CSVRecipients, MessageTemplate
+
+
+def test_placeholders_match_columns_case_insensitively():
+    template = MessageTemplate('Hello {First_Name}, you owe {balance}', ['first_name', 'Balance', 'phone'])
+    assert template.fields == ['first_name', 'balance']
+    assert template.is_personalized
+    assert template.render(['Ama', '12.50', '0241234567']) == 'Hello Ama, you owe 12.50'
+
+
+def test_escaped_braces_are_literal():
+    template = MessageTemplate('{{code}} {{{name}}}', ['name'])
+    assert template.fields == ['name']
+    assert template.render(['Ama']) == '{code} {Ama}'
+
+
+def test_plain_message_is_not_personalized():
+    template = MessageTemplate('No placeholders', ['name'])
+    assert not template.is_personalized
+    assert template.render(['Ama']) == 'No placeholders'
+
+
+def test_values_are_not_formatted_again():
+    template = MessageTemplate('Hi {name}', ['name'])
+    assert template.render(['{0} {name}']) == 'Hi {0} {name}'
+
+
+def test_short_rows_leave_columns_blank():
+    template = MessageTemplate('{name}/{balance}', ['phone', 'name', 'balance'])
+    assert template.render(['0241234567', 'Ama']) == 'Ama/'
+
+
+def test_unknown_column_is_rejected():
+    with pytest.raises(ValueError, match='Unknown placeholder'):
+        MessageTemplate('Hello {surname}', ['name'])
+
+
+def test_format_spec_is_rejected():
+    with pytest.raises(ValueError, match='Invalid placeholder'):
+        MessageTemplate('Hello {name:>10}', ['name'])
+
+
+def test_csv_recipients_find_phone_column():
+    stream = io.BytesIO('﻿Name,Phone\nAma,0241234567\nKofi,\nYaw, 0551234567 \n'.encode('utf-8'))
+    recipients = CSVRecipients(stream)
+    assert recipients.columns == ['Name', 'Phone']
+    assert list(recipients) == [('0241234567', ['Ama', '0241234567']), ('0551234567', ['Yaw', '0551234567'])]
+
+
+def test_csv_recipients_without_phone_column():
+    with pytest.raises(ValueError, match='No phone number column'):
+        CSVRecipients(io.BytesIO(b'name,balance\nAma,1\n'))
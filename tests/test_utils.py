@@ -0,0 +1,53 @@
+from utils import ENCODING_GSM7, ENCODING_UCS2, get_sms_segments
+
+
+def test_gsm7_single_part_limit():
+    assert get_sms_segments('a' * 160)['segments'] == 1
+    assert get_sms_segments('a' * 161)['segments'] == 2
+
+
+def test_gsm7_multipart_limit():
+    result = get_sms_segments('a' * 306)
+    assert result['encoding'] == ENCODING_GSM7
+    assert result['segments'] == 2
+    assert result['per_segment'] == 153
+    assert result['remaining'] == 0
+    assert get_sms_segments('a' * 307)['segments'] == 3
+
+
+def test_empty_message_has_no_parts():
+    assert get_sms_segments('')['segments'] == 0
+
+
+def test_extension_characters_take_two_septets():
+    result = get_sms_segments('€' * 80)
+    assert result['encoding'] == ENCODING_GSM7
+    assert result['units'] == 160
+    assert result['segments'] == 1
+    assert get_sms_segments('€' * 81)['segments'] == 2
+
+
+def test_extension_character_is_not_split_across_parts():
+    # 152 septets fill the first part but the escape pair needs two more
+    result = get_sms_segments('a' * 152 + '€' + 'a' * 10)
+    assert result['segments'] == 2
+    assert result['remaining'] == 153 - 12
+
+
+def test_ucs2_limits():
+    assert get_sms_segments('ж' * 70) == {
+        'encoding': ENCODING_UCS2, 'units': 70, 'segments': 1, 'per_segment': 70, 'remaining': 0
+    }
+    assert get_sms_segments('ж' * 71)['segments'] == 2
+    assert get_sms_segments('ж' * 134)['segments'] == 2
+    assert get_sms_segments('ж' * 135)['segments'] == 3
+
+
+def test_surrogate_pair_is_not_split_across_parts():
+    result = get_sms_segments('ж' * 66 + '😀' + 'ж' * 10)
+    assert result['encoding'] == ENCODING_UCS2
+    assert result['units'] == 78
+    assert result['segments'] == 2
+    # The emoji starts the second part instead of straddling the first two
+    assert result['remaining'] == 67 - 12
+    assert get_sms_segments('😀' * 35)['segments'] == 1
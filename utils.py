@@ -1,7 +1,28 @@
 import re
 import csv
 import io
-from typing import List, Optional
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+# Ghana mobile networks
+NETWORK_MTN = 'MTN'
+NETWORK_TELECEL = 'TELECEL'
+NETWORK_AIRTELTIGO = 'AIRTELTIGO'
+NETWORK_GLO = 'GLO'
+NETWORK_UNKNOWN = 'UNKNOWN'
+
+# Two-digit national prefix (the digits after +233) -> network
+_NETWORK_BY_PREFIX = {
+    '24': NETWORK_MTN, '25': NETWORK_MTN, '53': NETWORK_MTN, '54': NETWORK_MTN,
+    '55': NETWORK_MTN, '59': NETWORK_MTN,
+    '20': NETWORK_TELECEL, '50': NETWORK_TELECEL,
+    '26': NETWORK_AIRTELTIGO, '27': NETWORK_AIRTELTIGO, '56': NETWORK_AIRTELTIGO,
+    '57': NETWORK_AIRTELTIGO,
+    '23': NETWORK_GLO,
+}
+
+# Flat lookup table over all 100 prefixes, built once at import
+NETWORK_PREFIX_TABLE = tuple(_NETWORK_BY_PREFIX.get(f'{i:02d}', NETWORK_UNKNOWN) for i in range(100))
 
 def clean_phone_number(phone_number: str) -> str:
     """Clean and format phone number"""
@@ -48,6 +69,49 @@ def validate_single_phone_number(phone_number: str) -> bool:
     ghana_pattern = r'^\+233[2-5]\d{8}$'
     return bool(re.match(ghana_pattern, phone_number))
 
+def normalize_phone_numbers(phone_numbers: List[str]) -> Tuple[List[str], List[str], int]:
+    """Clean, validate and deduplicate phone numbers in one pass.
+
+    Returns (valid_numbers, invalid_numbers, duplicate_count). Valid numbers
+    are in +233 format and keep the order they were first seen in.
+    """
+    valid_numbers = []
+    invalid_numbers = []
+    seen = set()
+    duplicates = 0
+    
+    for number in phone_numbers:
+        cleaned_number = clean_phone_number(number)
+        if not validate_single_phone_number(cleaned_number):
+            invalid_numbers.append(number)
+        elif cleaned_number in seen:
+            duplicates += 1
+        else:
+            seen.add(cleaned_number)
+            valid_numbers.append(cleaned_number)
+    
+    return valid_numbers, invalid_numbers, duplicates
+
+def get_phone_network(phone_number: str) -> str:
+    """Classify a +233XXXXXXXXX phone number to its mobile network"""
+    prefix = phone_number[4:6]
+    if len(prefix) != 2 or not prefix.isdigit():
+        return NETWORK_UNKNOWN
+    return NETWORK_PREFIX_TABLE[int(prefix)]
+
+def parse_network_values(value: str) -> Dict[str, float]:
+    """Parse a per-network setting such as "MTN=20,TELECEL=10" into a {network: value} mapping"""
+    values = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        network, number = item.split('=', 1)
+        try:
+            values[network.strip().upper()] = float(number)
+        except ValueError:
+            logging.warning(f"Ignoring invalid network setting: {item}")
+    return values
+
 def parse_csv_content(csv_content: str) -> List[str]:
     """Parse CSV content and extract phone numbers"""
     phone_numbers = []
@@ -98,22 +162,70 @@ def format_phone_number_for_display(phone_number: str) -> str:
     
     return phone_number
 
+# GSM 03.38 basic character set; each character is one septet
+GSM7_BASIC_CHARS = (
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+# GSM 03.38 extension table; each character is sent as an escape plus one septet
+GSM7_EXTENSION_CHARS = "\f^{}\\[]~|€"
+
+ENCODING_GSM7 = 'GSM-7'
+ENCODING_UCS2 = 'UCS-2'
+
+# (limit for a single-part message, limit per part of a multipart message),
+# in septets for GSM-7 and UTF-16 code units for UCS-2
+SMS_SEGMENT_LIMITS = {
+    ENCODING_GSM7: (160, 153),
+    ENCODING_UCS2: (70, 67),
+}
+
+# Character -> septets, built once at import
+_GSM7_SEPTETS = {char: 1 for char in GSM7_BASIC_CHARS}
+_GSM7_SEPTETS.update((char, 2) for char in GSM7_EXTENSION_CHARS)
+
+def get_sms_segments(message: str) -> Dict[str, Any]:
+    """Work out how a message will be encoded and split into SMS parts.
+
+    Messages made only of GSM-7 characters are sent 160 septets in one
+    part or 153 per part; anything else is sent as UCS-2, 70 code units in
+    one part or 67 per part. Two-unit characters (GSM extension characters,
+    UCS-2 surrogate pairs) are never split across parts.
+    """
+    try:
+        widths = [_GSM7_SEPTETS[char] for char in message]
+        encoding = ENCODING_GSM7
+    except KeyError:
+        widths = [2 if ord(char) > 0xFFFF else 1 for char in message]
+        encoding = ENCODING_UCS2
+    
+    units = sum(widths)
+    single_limit, multipart_limit = SMS_SEGMENT_LIMITS[encoding]
+    
+    if units <= single_limit:
+        segments = 1 if units else 0
+        per_segment = single_limit
+        remaining = single_limit - units
+    else:
+        segments = 1
+        used = 0
+        for width in widths:
+            if used + width > multipart_limit:
+                segments += 1
+                used = 0
+            used += width
+        per_segment = multipart_limit
+        remaining = multipart_limit - used
+    
+    return {
+        'encoding': encoding,
+        'units': units,
+        'segments': segments,
+        'per_segment': per_segment,
+        'remaining': remaining
+    }
+
 def count_sms_parts(message: str) -> int:
     """Count how many SMS parts a message will be split into"""
-    if not message:
-        return 0
-    
-    # Standard SMS is 160 characters for GSM 7-bit
-    # Unicode messages are 70 characters per part
-    
-    # Check if message contains non-GSM characters
-    gsm_chars = set("@£$¥èéùìòÇØøÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà\n\r\t")
-    
-    is_unicode = any(char not in gsm_chars for char in message)
-    
-    if is_unicode:
-        # Unicode SMS: 70 characters per part
-        return (len(message) + 69) // 70
-    else:
-        # GSM 7-bit SMS: 160 characters per part
-        return (len(message) + 159) // 160
+    return get_sms_segments(message)['segments']
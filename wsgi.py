@@ -0,0 +1,17 @@
+"""
+Production WSGI entry point for the Bulk SMS Broadcasting Application.
+
+Unlike main.py, importing this module does no database work: schema setup
+runs once as a separate step (init_db.py, or the on_starting hook in
+gunicorn.conf.py). Serve it with:
+
+    gunicorn --config gunicorn.conf.py wsgi:app
+"""
+
+import os
+
+# Tables are created by init_db, not by every worker on import
+os.environ.setdefault("AUTO_CREATE_TABLES", "False")
+os.environ.setdefault("LOG_LEVEL", "INFO")
+
+from app import app  # noqa: E402